@@ -0,0 +1,210 @@
+from corpus import CorpusSpec, generate_corpus, write_corpus
+from htmlnode import LeafNode, ParentNode, text_node_to_html_node
+from inline_markdown import (clear_inline_cache, determine_block_type, markdown_to_blocks, markdown_to_html_node,
+                             text_to_textnodes)
+from build import generate_pages_recursive
+from textnode import TextNode, TextType
+import argparse, json, os, re, sys, tempfile, time, tracemalloc
+
+TEMPLATE = "<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+
+
+# Dict-backed copies of the node classes as they were before __slots__, kept
+# here so the node benchmark has something to compare against.
+class DictTextNode():
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+class DictHTMLNode():
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+class DictLeafNode(DictHTMLNode):
+    def __init__(self, tag, value, props=None):
+        super().__init__(tag, value, None, props)
+        self.tag = tag
+        self.value = value
+        self.props = props
+
+class DictParentNode(DictHTMLNode):
+    def __init__(self, tag, children, props=None):
+        super().__init__(tag, None, children, props)
+        self.tag = tag
+        self.children = children
+        self.props = props
+
+
+def build_nodes(count, text_cls, leaf_cls, parent_cls):
+    nodes = []
+    for i in range(count):
+        text = text_cls("word", TextType.NORMAL_TEXT)
+        leaf = leaf_cls("b", text.text)
+        nodes.append(parent_cls("p", [leaf]))
+    return nodes
+
+def measure(func, *args, reset=None):
+    # time and memory come from separate runs, tracemalloc skews timings;
+    # reset, if given, runs before each so neither starts from a warm cache
+    if reset is not None:
+        reset()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    del result
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+def bench_nodes(count=10000, repeat=5):
+    variants = {
+        "dict": (DictTextNode, DictLeafNode, DictParentNode),
+        "slots": (TextNode, LeafNode, ParentNode),
+    }
+    results = {}
+    for name, classes in variants.items():
+        runs = [measure(build_nodes, count, *classes) for _ in range(repeat)]
+        results[name] = (min(run[0] for run in runs), min(run[1] for run in runs))
+
+    # time only: the conversion table versus constructing the leaf directly
+    text_nodes = [TextNode("word", text_type, "/url") for text_type in TextType] * (count // len(TextType))
+    start = time.perf_counter()
+    for text_node in text_nodes:
+        text_node_to_html_node(text_node)
+    results["convert"] = (time.perf_counter() - start, None)
+    return results
+
+def print_node_report(results, count):
+    print(f"{count} x (TextNode + LeafNode + ParentNode)")
+    for name in ("dict", "slots"):
+        elapsed, peak = results[name]
+        print(f"  {name:6} {elapsed * 1000:8.2f} ms {peak / 1024:10.1f} KiB")
+    dict_time, dict_peak = results["dict"]
+    slots_time, slots_peak = results["slots"]
+    print(f"  saved  {(1 - slots_time / dict_time) * 100:8.1f} %  {(1 - slots_peak / dict_peak) * 100:8.1f} % memory")
+    print(f"  text_node_to_html_node: {results['convert'][0] * 1000:.2f} ms for {count} nodes")
+
+def build_stages(corpus, work_dir):
+    markdowns = list(corpus.values())
+    inline_texts = [
+        re.sub(r"\s+", " ", block)
+        for markdown in markdowns
+        for block in markdown_to_blocks(markdown)
+        if determine_block_type(block) == "paragraph"
+    ]
+    trees = [markdown_to_html_node(markdown) for markdown in markdowns]
+
+    content_dir = os.path.join(work_dir, "content")
+    output_dir = os.path.join(work_dir, "docs")
+    template_path = os.path.join(work_dir, "template.html")
+    write_corpus(corpus, content_dir)
+    with open(template_path, "w") as f:
+        f.write(TEMPLATE)
+
+    return {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(markdown) for markdown in markdowns],
+        "text_to_textnodes": lambda: [text_to_textnodes(text) for text in inline_texts],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(markdown) for markdown in markdowns],
+        "to_html": lambda: [tree.to_html() for tree in trees],
+        "build": lambda: generate_pages_recursive(content_dir, template_path, output_dir, "/"),
+    }
+
+def bench_stages(spec, repeat=3):
+    corpus = generate_corpus(spec)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, stage in build_stages(corpus, work_dir).items():
+            # the inline memo lives as long as the process, so without this
+            # every repeat after the first would time cache hits
+            runs = [measure(stage, reset=clear_inline_cache) for _ in range(repeat)]
+            results[name] = {
+                "seconds": min(run[0] for run in runs),
+                "peak_bytes": min(run[1] for run in runs),
+            }
+    return {"spec": spec.to_dict(), "stages": results}
+
+def compare_stages(current, baseline, threshold):
+    regressions = []
+    rows = []
+    for name, result in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            rows.append((name, result, None, None))
+            continue
+        time_delta = result["seconds"] / base["seconds"] - 1 if base["seconds"] else 0.0
+        memory_delta = result["peak_bytes"] / base["peak_bytes"] - 1 if base["peak_bytes"] else 0.0
+        rows.append((name, result, time_delta, memory_delta))
+        if time_delta > threshold:
+            regressions.append(f"{name}: time +{time_delta * 100:.1f}%")
+        if memory_delta > threshold:
+            regressions.append(f"{name}: peak memory +{memory_delta * 100:.1f}%")
+    return rows, regressions
+
+def print_stage_report(rows):
+    print(f"{'stage':24} {'time':>12} {'peak':>12} {'d time':>9} {'d peak':>9}")
+    for name, result, time_delta, memory_delta in rows:
+        line = f"{name:24} {result['seconds'] * 1000:9.2f} ms {result['peak_bytes'] / 1024:8.0f} KiB"
+        if time_delta is not None:
+            line += f" {time_delta * 100:+8.1f}% {memory_delta * 100:+8.1f}%"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the site generator.")
+    parser.add_argument("suite", choices=["nodes", "stages"])
+    parser.add_argument("--count", type=int, default=10000, help="nodes: objects per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best one counts")
+    corpus = parser.add_argument_group("synthetic corpus (stages)")
+    defaults = CorpusSpec()
+    corpus.add_argument("--seed", type=int, default=defaults.seed)
+    corpus.add_argument("--pages", type=int, default=defaults.pages)
+    corpus.add_argument("--blocks", type=int, default=defaults.blocks, help="blocks per page")
+    corpus.add_argument("--link-density", type=float, default=defaults.link_density,
+                        help="chance that a sentence contains a link")
+    corpus.add_argument("--list-mix", type=float, default=defaults.list_mix, help="share of list blocks")
+    corpus.add_argument("--code-mix", type=float, default=defaults.code_mix, help="share of code blocks")
+    corpus.add_argument("--depth", type=int, default=defaults.depth, help="maximum directory nesting")
+    gate = parser.add_argument_group("baselines (stages)")
+    gate.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    gate.add_argument("--compare", metavar="PATH", help="fail if a stage regressed against this baseline")
+    gate.add_argument("--threshold", type=float, default=0.2,
+                      help="allowed slowdown or memory growth before --compare fails (0.2 = 20%%)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.suite == "nodes":
+        print_node_report(bench_nodes(args.count), args.count)
+        return 0
+
+    spec = CorpusSpec(args.seed, args.pages, args.blocks, args.link_density, args.list_mix,
+                      args.code_mix, args.depth)
+    current = bench_stages(spec, args.repeat)
+    baseline = {"stages": {}}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("spec") != current["spec"]:
+            print("warning: the baseline was recorded with a different corpus", file=sys.stderr)
+    rows, regressions = compare_stages(current, baseline, args.threshold)
+    print_stage_report(rows)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+    if regressions:
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
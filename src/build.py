@@ -0,0 +1,321 @@
+from compress import CODECS, compress_outputs, remove_compressed
+from images import ImageOptimizer
+from inline_markdown import *
+from linkcheck import check_refs
+from listings import publish_listings
+from minify import CssMinifier
+from pageio import PageIO, replace_if_changed, write_text
+from manifest import hash_file
+from parse_cache import ParseCache
+from plan import plan_pages, schedule
+from search import publish_search, remove_search
+from shards import select_shard
+from site_index import MetadataCollector, page_metadata
+from sync import asset_urls, image_sizes
+from template import get_loader
+from urls import UrlRewriter
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+import hashlib, json, logging, os, shutil, time
+import log
+
+logger = logging.getLogger("site")
+
+# rendering and the site-wide steps after it, shared by main.py and watch.py
+
+def publish_site_listings(args, paths, manifest, options, index):
+    static_outputs = {entry["output"] for entry in manifest.assets.values()}
+    publish_listings(index, paths.template, args.basepath, options, args.site_url, args.feed_section,
+                     manifest.inputs_hash, args.listings, static_outputs)
+    if args.search:
+        stats = publish_search(index, args.basepath)
+        logger.info("Search index: %d pages, %d shards (%d rewritten), %d bytes in total", stats.docs,
+                    stats.shards, stats.written, stats.total_bytes)
+        logger.info("A query fetches index.json (%d bytes) plus one shard per distinct term prefix "
+                    "(%d bytes on average, %d at most)", stats.index_bytes, stats.average_shard_bytes,
+                    stats.largest_shard_bytes)
+    else:
+        removed = remove_search(index)
+        if removed:
+            logger.info("Removed the search index, %d file(s)", len(removed))
+
+def check_site_links(args, paths, manifest, index):
+    refs = index.refs()
+    broken = check_refs(index.pages(), refs, manifest.assets, args.basepath, index.get_state("listings", []))
+    for ref in broken:
+        logger.error("error: %s:%d: broken %s %s (%s)", os.path.join(paths.content, ref.source), ref.line,
+                     ref.kind, ref.target, ref.reason)
+    logger.info("Checked %d links and images, %d broken", len(refs), len(broken))
+    return len(broken)
+
+def precompress_site(args, paths, manifest):
+    if not args.precompress:
+        if manifest.compressed:
+            removed = remove_compressed(paths.output, manifest.compressed)
+            manifest.compressed = {}
+            logger.info("Removed the precompressed variants of %d file(s)", len(removed))
+        return
+    result = compress_outputs(paths.output, manifest.compressed, args.precompress_min_size, args.jobs)
+    manifest.compressed = result.entries
+    logger.info("Precompressed %d file(s) as %s, %d unchanged", len(result.compressed), "/".join(CODECS),
+                len(result.entries) - len(result.compressed))
+
+def render_options(args, paths, manifest=None):
+    parse_cache = None
+    if args.parse_cache:
+        parse_cache = ParseCache(paths.parse_cache, args.parse_cache_size * 1024 * 1024)
+    urls = asset_urls(manifest.assets) if args.fingerprint and manifest is not None else {}
+    sizes = image_sizes(manifest.assets) if manifest is not None else {}
+    return RenderOptions(parse_cache, urls, sizes, args.minify, args.io_threads, args.search,
+                         args.stream_above * 1024 * 1024, args.inline_cache_size)
+
+def asset_optimizers(args, paths):
+    optimizers = []
+    if args.optimize_images:
+        optimizers.append(ImageOptimizer(paths.image_cache))
+    if args.minify:
+        optimizers.append(CssMinifier(paths.minify_cache))
+    return optimizers
+
+def render_inputs_hash(paths, options):
+    # everything besides its own source that can change a rendered page
+    digest = hashlib.sha256(get_loader(paths.template).inputs_hash().encode())
+    digest.update(json.dumps([options.asset_urls, options.image_sizes, options.minify, options.search],
+                             sort_keys=True).encode())
+    return digest.hexdigest()
+
+def write_asset_manifest(output_dir, assets, fingerprint):
+    path = os.path.join(output_dir, "asset-manifest.json")
+    if not fingerprint:
+        if os.path.exists(path) and "asset-manifest.json" not in assets:
+            os.unlink(path)
+        return
+    text = json.dumps({rel: entry["output"] for rel, entry in sorted(assets.items())}, indent=1) + "\n"
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == text:
+                return
+    with open(path, "w") as f:
+        f.write(text)
+
+def report_failures(error):
+    for source, message in error.failures:
+        logger.error("error: %s: %s", source, message)
+    logger.error("error: %s", error)
+
+def prep_target_dir(target):
+    if not os.path.exists(target):
+        os.makedirs(target, exist_ok=True)
+        logger.debug("The directory at %s was created.", target)
+    else:
+        for item in os.listdir(target):
+            item_path = os.path.join(target, item)
+            if os.path.isfile(item_path) or os.path.islink(item_path):
+                os.unlink(item_path)
+            elif os.path.isdir(item_path):
+                shutil.rmtree(item_path)
+        logger.debug("The directory at %s has been cleared.", target)
+
+class RenderOptions():
+    def __init__(self, parse_cache=None, asset_urls=None, image_sizes=None, minify=False, io_threads=4,
+                 search=False, stream_above=None, inline_cache_size=INLINE_CACHE_SIZE):
+        self.parse_cache = parse_cache
+        self.asset_urls = asset_urls or {}
+        self.image_sizes = image_sizes or {}
+        self.minify = minify
+        self.io_threads = io_threads
+        self.search = search
+        self.stream_above = stream_above
+        self.inline_cache_size = inline_cache_size
+
+def should_stream(from_path, options):
+    if options is None or options.stream_above is None:
+        return False
+    return os.path.getsize(from_path) > options.stream_above
+
+def generate_page(from_path, template_path, dest_path, basepath, options=None, markdown=None, io=None):
+    if markdown is None and should_stream(from_path, options):
+        return stream_page(from_path, template_path, dest_path, basepath, options)
+    started = time.perf_counter()
+
+    # read md and save to var, unless it was prefetched
+    if markdown is None:
+        with open(from_path) as f:
+            markdown = f.read()
+    source = markdown
+    meta, markdown = split_front_matter(source)
+    first_line = source.count("\n", 0, len(source) - len(markdown)) + 1
+    title = extract_title(markdown)
+
+    # templates are compiled once per process and reused for every page
+    minify = options is not None and options.minify
+    template = get_loader(template_path, minify).layout(meta.get("layout"))
+
+    # convert md to html w. core fxns, unless this exact source was parsed before
+    if options is not None and options.parse_cache is not None:
+        content_node = options.parse_cache.parse(markdown)
+    else:
+        content_node = markdown_to_html_node(markdown)
+    context = dict(meta)
+    context["Title"] = title
+    context["Content"] = content_node
+
+    # site-absolute URLs get the basepath as they are emitted rather than by
+    # rewriting the finished document
+    if options is None:
+        rewriter = UrlRewriter(basepath)
+    else:
+        rewriter = UrlRewriter(basepath, options.asset_urls, options.image_sizes)
+    text = "".join(template.render(context, rewriter))
+    written = len(text)
+    if io is not None:
+        # hand the page to the writer threads and move on to the next render
+        io.write(dest_path, text)
+    else:
+        write_text(dest_path, text)
+
+    logger.info("%s -> %s (%d blocks, %d chars, %.1f ms)", from_path, dest_path,
+                len(content_node.children), written, (time.perf_counter() - started) * 1000)
+    search = options is not None and options.search
+    return page_metadata(meta, title, content_node, extract_markdown_refs(markdown, first_line), search)
+
+def stream_page(from_path, template_path, dest_path, basepath, options):
+    # bounded memory for huge sources: lines are read, grouped into blocks,
+    # built into nodes and written out one block at a time, so neither the
+    # source, the tree nor the page is ever held whole
+    started = time.perf_counter()
+    collector = MetadataCollector(options.search)
+    with open(from_path) as source:
+        first = source.readline()
+        header = ""
+        if first == "---\n":
+            header_lines = [first]
+            for line in source:
+                header_lines.append(line)
+                if line.startswith("---"):
+                    break
+            header = "".join(header_lines)
+            first = source.readline()
+        meta = split_front_matter(header)[0] if header else {}
+        offset = header.count("\n")
+        title = extract_title(first)
+        template = get_loader(template_path, options.minify).layout(meta.get("layout"))
+
+        def content():
+            for block, node in iter_block_nodes(chain([first], source)):
+                refs = ()
+                if block.type != "code":
+                    refs = extract_markdown_refs("\n".join(block.lines), offset + block.start)
+                collector.add_block(node, refs)
+                yield node
+
+        context = dict(meta)
+        context["Title"] = title
+        context["Content"] = StreamNode("div", content())
+        rewriter = UrlRewriter(basepath, options.asset_urls, options.image_sizes)
+        directory = os.path.dirname(dest_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        written = 0
+        tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                for chunk in template.render(context, rewriter):
+                    written += f.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        replace_if_changed(tmp_path, dest_path)
+
+    logger.info("%s -> %s (%d blocks, %d chars, %.1f ms, streamed)", from_path, dest_path,
+                collector.blocks, written, (time.perf_counter() - started) * 1000)
+    return collector.metadata(meta, title)
+
+def collect_pages(dir_path_content, dest_dir_path, include=(), exclude=()):
+    return [(job.source, job.dest) for job in plan_pages(dir_path_content, dest_dir_path, include, exclude)]
+
+class PageBuildError(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__(f"{len(failures)} page(s) failed to build")
+
+def render_batch(job):
+    # one process's share of the pages, rendered in order while the next
+    # sources are read and finished pages written on background threads
+    pages, template_path, basepath, options = job
+    io_threads = options.io_threads if options is not None else 4
+    if options is not None:
+        set_inline_cache_size(options.inline_cache_size)
+    before = inline_cache_info()
+    errors = {}
+    metadata = {}
+    sources = {dest: source for source, dest in pages}
+    with PageIO(io_threads) as io:
+        # streamed pages are read as they render, never prefetched whole
+        reads = io.read_all([None if should_stream(source, options) else source for source, _ in pages])
+        for (source, dest), read in zip(pages, reads):
+            try:
+                markdown = read.result() if read is not None else None
+                metadata[source] = generate_page(source, template_path, dest, basepath, options, markdown, io)
+            except Exception as e:
+                errors[source] = f"{type(e).__name__}: {e}"
+    for dest, error in io.failures:
+        errors[sources[dest]] = error
+    after = inline_cache_info()
+    return errors, metadata, (after.hits - before.hits, after.misses - before.misses)
+
+def render_pages(pages, template_path, basepath, jobs=1, options=None, sizes=None):
+    # returns the failures, in page order, and the index metadata of every page
+    if jobs == 1 or len(pages) < 2:
+        errors, metadata, memo = render_batch((pages, template_path, basepath, options))
+    else:
+        workers = min(jobs, len(pages))
+        size = max(1, len(pages) // (workers * 4))
+        ordered = schedule(pages, sizes)
+        batches = [(ordered[i:i + size], template_path, basepath, options) for i in range(0, len(pages), size)]
+        errors = {}
+        metadata = {}
+        memo = (0, 0)
+        with ProcessPoolExecutor(max_workers=workers, initializer=log.configure_logging,
+                                 initargs=(log.verbosity,)) as pool:
+            for batch_errors, batch_metadata, batch_memo in pool.map(render_batch, batches):
+                errors.update(batch_errors)
+                metadata.update(batch_metadata)
+                memo = (memo[0] + batch_memo[0], memo[1] + batch_memo[1])
+    if pages:
+        logger.info("Inline memo: %d hits, %d misses", *memo)
+    return [(source, errors[source]) for source, _ in pages if source in errors], metadata
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1,
+                             shard=None):
+    pages = select_shard(collect_pages(dir_path_content, dest_dir_path), dir_path_content, shard)
+    build_pages(pages, template_path, basepath, manifest, jobs)
+    return [source for source, _ in pages]
+
+def build_pages(pages, template_path, basepath, manifest=None, jobs=1, options=None, index=None, sizes=None):
+    hashes = {}
+    if manifest is not None:
+        # a page missing from the index is rendered again to get its metadata
+        indexed = index.hashes() if index is not None else None
+        stale_pages = []
+        for source, dest in pages:
+            hashes[source] = hash_file(source)
+            if manifest.page_is_stale(source, hashes[source], dest) or \
+                    (indexed is not None and indexed.get(index.source_key(source)) != hashes[source]):
+                stale_pages.append((source, dest))
+            else:
+                logger.debug("%s is unchanged, skipping", source)
+        pages = stale_pages
+
+    failures, metadata = render_pages(pages, template_path, basepath, jobs, options, sizes)
+    failed = {source for source, _ in failures}
+    for source, dest in pages:
+        if source in failed:
+            continue
+        if manifest is not None:
+            manifest.record_page(source, hashes[source], dest)
+        if index is not None:
+            index.record_page(source, hashes.get(source) or hash_file(source), dest, metadata[source])
+    if failures:
+        raise PageBuildError(failures)
+    return len(pages)
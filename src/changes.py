@@ -0,0 +1,34 @@
+from collections import namedtuple
+from manifest import hash_file
+from plan import scan_files
+import json, os
+
+# output paths, relative to the output directory, that a deploy has to
+# upload or purge
+OutputChanges = namedtuple("OutputChanges", ["added", "changed", "removed"])
+
+
+def snapshot_outputs(output_dir, content=False):
+    # unchanged outputs are never rewritten, so size and mtime tell changed
+    # files apart; after a --clean wipe only the content can
+    if not os.path.isdir(output_dir):
+        return {}
+    if content:
+        return {rel: hash_file(path) for rel, path, _ in scan_files(output_dir)}
+    return {rel: (stat.st_size, stat.st_mtime_ns) for rel, _, stat in scan_files(output_dir)}
+
+def diff_outputs(before, after):
+    return OutputChanges(
+        added=sorted(rel for rel in after if rel not in before),
+        changed=sorted(rel for rel, stamp in after.items() if rel in before and before[rel] != stamp),
+        removed=sorted(rel for rel in before if rel not in after),
+    )
+
+def write_changes(changes, path):
+    # one JSON object; "-" prints it to stdout, which carries nothing else
+    text = json.dumps(changes._asdict(), indent=1) + "\n"
+    if path == "-":
+        print(text, end="")
+        return
+    with open(path, "w") as f:
+        f.write(text)
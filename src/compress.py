@@ -0,0 +1,83 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from sync import source_digest, walk_files
+import gzip, logging, os
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None  # python < 3.14
+
+logger = logging.getLogger("site")
+
+TEXT_EXTENSIONS = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+
+CompressResult = namedtuple("CompressResult", ["entries", "compressed", "removed"])
+
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output identical across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def zstd_bytes(data):
+    return zstd.compress(data, level=zstd.CompressionParameter.compression_level.bounds()[1])
+
+CODECS = {".gz": gzip_bytes}
+if zstd is not None:
+    CODECS[".zst"] = zstd_bytes
+# every suffix an earlier build may have written, whatever this Python has
+VARIANT_SUFFIXES = (".gz", ".zst")
+
+
+def compress_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    for suffix, codec in CODECS.items():
+        tmp_path = path + suffix + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(codec(data))
+        os.replace(tmp_path, path + suffix)
+
+def remove_variants(path):
+    for suffix in VARIANT_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+def has_variants(path):
+    return all(os.path.exists(path + suffix) for suffix in CODECS)
+
+def compress_outputs(output_dir, previous=None, min_size=1024, jobs=1):
+    previous = previous or {}
+    entries = {}
+    pending = []
+    for rel in walk_files(output_dir):
+        if not rel.endswith(TEXT_EXTENSIONS):
+            continue
+        path = os.path.join(output_dir, rel)
+        stat = os.stat(path)
+        if stat.st_size < min_size:
+            # small files gain little and cost a decompression on every hit
+            remove_variants(path)
+            continue
+        entry = previous.get(rel)
+        digest = source_digest(path, stat, entry)
+        entries[rel] = {"hash": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if entry is None or entry.get("hash") != digest or not has_variants(path):
+            pending.append(rel)
+
+    if pending:
+        # zlib and zstd release the GIL, so threads are enough to keep every core busy
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            list(executor.map(compress_file, [os.path.join(output_dir, rel) for rel in pending]))
+
+    removed = sorted(rel for rel in previous if rel not in entries)
+    for rel in removed:
+        remove_variants(os.path.join(output_dir, rel))
+    return CompressResult(entries, pending, removed)
+
+def remove_compressed(output_dir, previous):
+    # precompression is off, so every variant an earlier build wrote would
+    # go on being served for an output that has since been rewritten
+    for rel in previous:
+        remove_variants(os.path.join(output_dir, rel))
+    return sorted(previous)
@@ -0,0 +1,83 @@
+import os, random
+
+WORDS = (
+    "elf dwarf hobbit ring mountain river shadow light forest tower king road "
+    "song council wizard sword star ship harbor valley gate stone fire water "
+    "journey shire lore ancient silver golden council tale age realm"
+).split()
+
+
+class CorpusSpec():
+    def __init__(self, seed=1, pages=50, blocks=40, link_density=0.2, list_mix=0.15,
+                 code_mix=0.1, depth=2):
+        self.seed = seed
+        self.pages = pages
+        self.blocks = blocks
+        self.link_density = link_density
+        self.list_mix = list_mix
+        self.code_mix = code_mix
+        self.depth = depth
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def sentence(rng, spec):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 16))]
+    if rng.random() < spec.link_density:
+        i = rng.randrange(len(words))
+        words[i] = f"[{words[i]}](/{rng.choice(WORDS)}/{rng.choice(WORDS)})"
+    roll = rng.random()
+    i = rng.randrange(len(words))
+    if roll < 0.15:
+        words[i] = f"**{words[i]}**"
+    elif roll < 0.3:
+        words[i] = f"_{words[i]}_"
+    elif roll < 0.4:
+        words[i] = f"`{words[i]}`"
+    return " ".join(words).capitalize() + "."
+
+def block(rng, spec):
+    roll = rng.random()
+    if roll < spec.code_mix:
+        lines = [f"    {rng.choice(WORDS)}({rng.choice(WORDS)})" for _ in range(rng.randint(2, 8))]
+        return "```\n" + "\n".join(lines) + "\n```"
+    roll -= spec.code_mix
+    if roll < spec.list_mix:
+        marker = rng.choice(["-", "*", "1."])
+        items = []
+        for n in range(rng.randint(2, 8)):
+            prefix = f"{n + 1}." if marker == "1." else marker
+            items.append(f"{prefix} {sentence(rng, spec)}")
+        return "\n".join(items)
+    roll -= spec.list_mix
+    if roll < 0.1:
+        return "## " + " ".join(rng.choice(WORDS) for _ in range(3)).title()
+    if roll < 0.15:
+        return "> " + sentence(rng, spec)
+    return "\n".join(sentence(rng, spec) for _ in range(rng.randint(2, 6)))
+
+def generate_page(rng, spec, title):
+    blocks = [f"# {title}"]
+    blocks.extend(block(rng, spec) for _ in range(spec.blocks))
+    return "\n\n".join(blocks) + "\n"
+
+def page_path(rng, spec, index):
+    parts = [f"section-{rng.randrange(4)}" for _ in range(rng.randint(0, spec.depth))]
+    parts.append(f"page-{index}")
+    return "/".join(parts) + "/index.md"
+
+def generate_corpus(spec):
+    # same spec, same corpus: the generator only draws from its own seeded rng
+    rng = random.Random(spec.seed)
+    corpus = {}
+    for index in range(spec.pages):
+        corpus[page_path(rng, spec, index)] = generate_page(rng, spec, f"Page {index}")
+    return corpus
+
+def write_corpus(corpus, content_dir):
+    for rel, markdown in corpus.items():
+        path = os.path.join(content_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(markdown)
@@ -1,21 +1,31 @@
 from textnode import TextNode, TextType
 
 class HTMLNode():
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def iter_html(self, rewriter=None):
         raise NotImplementedError
+
+    def to_html(self, rewriter=None):
+        return "".join(self.iter_html(rewriter))
+
+    def write_html(self, fp, rewriter=None):
+        for chunk in self.iter_html(rewriter):
+            fp.write(chunk)
     
-    def props_to_html(self):
+    def props_to_html(self, rewriter=None):
         strings = []
         if not self.props:
             return '' 
-        for k in self.props.keys():
-            strings.append(f"{k}=\"{self.props[k]}\"")
+        props = self.props if rewriter is None else rewriter.props(self.tag, self.props)
+        for k in props.keys():
+            strings.append(f"{k}=\"{props[k]}\"")
         return " " + (" ").join(strings)
 
     def __eq__(self):
@@ -26,54 +36,80 @@ class HTMLNode():
     
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag, value, None, props)
         self.tag = tag
         self.value = value
+        self.children = None
         self.props = props
 
-    def to_html(self):
+    def iter_html(self, rewriter=None):
         if self.value is None:
             raise ValueError("Leaf node must have value")
         if not self.tag:
-            return self.value
-        html_tag = f"<{self.tag}{super().props_to_html()}>{self.value}</{self.tag}>"
-        return html_tag
+            yield self.value
+            return
+        yield f"<{self.tag}{self.props_to_html(rewriter)}>{self.value}</{self.tag}>"
 
     
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag, None, children, props)
         self.tag = tag
+        self.value = None
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def open_tag(self, rewriter=None):
         if not self.tag:
             raise ValueError("Tag is required for any object node")
         if not self.children:
             raise ValueError(f"ParentNode with tag '{self.tag}' has no children")
-        else:
-            subtree_html = ''
-            for child in self.children:
-                subtree_html += child.to_html()
-            return f"<{self.tag}>{subtree_html}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html(rewriter)}>"
+
+    def iter_html(self, rewriter=None):
+        # walk the tree with an explicit stack so deep documents cannot hit
+        # the recursion limit, yielding chunks instead of building subtrees
+        yield self.open_tag(rewriter)
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if isinstance(child, ParentNode):
+                    yield child.open_tag(rewriter)
+                    stack.append((child, iter(child.children)))
+                    break
+                yield from child.iter_html(rewriter)
+            else:
+                stack.pop()
+                yield f"</{node.tag}>"
         
 
+class StreamNode(ParentNode):
+    # children come from an iterator and are serialized as they are produced,
+    # so the whole tree never exists at once; it can only be rendered once
+    __slots__ = ()
+
+    def iter_html(self, rewriter=None):
+        yield self.open_tag(rewriter)
+        for child in self.children:
+            yield from child.iter_html(rewriter)
+        yield f"</{self.tag}>"
+
+
+TEXT_NODE_CONVERTERS = {
+    TextType.NORMAL_TEXT: lambda node: LeafNode(None, node.text),
+    TextType.BOLD_TEXT: lambda node: LeafNode("b", node.text),
+    TextType.ITALIC_TEXT: lambda node: LeafNode("i", node.text),
+    TextType.CODE_TEXT: lambda node: LeafNode("code", node.text),
+    TextType.LINK: lambda node: LeafNode("a", node.text, {"href": node.url}),
+    TextType.IMAGE: lambda node: LeafNode("img", '', {"src": node.url, "alt": node.text}),
+}
+
 def text_node_to_html_node(text_node):
-    match (text_node.text_type):
-        case (TextType.NORMAL_TEXT):
-            return LeafNode(None, text_node.text)
-        case (TextType.BOLD_TEXT):
-            return LeafNode("b", text_node.text)
-        case (TextType.ITALIC_TEXT):
-            return LeafNode("i", text_node.text)
-        case (TextType.CODE_TEXT):
-            return LeafNode("code", text_node.text)
-        case (TextType.LINK):
-            return LeafNode("a", text_node.text, {"href": text_node.url})
-        case (TextType.IMAGE):
-            return LeafNode("img", '', {"src": text_node.url, "alt": text_node.text})
-        case _:
-            raise Exception("Invalid text type")
-        
\ No newline at end of file
+    converter = TEXT_NODE_CONVERTERS.get(text_node.text_type)
+    if converter is None:
+        raise Exception("Invalid text type")
+    return converter(text_node)
@@ -0,0 +1,155 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging, os, struct, zlib
+import log
+
+logger = logging.getLogger("site")
+
+# bump when the optimizer output changes so stale cache entries are not reused
+IMAGE_VERSION = 2
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# critical chunks, tRNS, which carries transparency, and the colour space
+# chunks, which change how colour-managed browsers display the pixels; text,
+# timestamps and other metadata are dropped
+PNG_KEEP_CHUNKS = (b"IHDR", b"PLTE", b"tRNS", b"IDAT", b"IEND",
+                   b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"cICP", b"mDCv", b"cLLi")
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+IMAGE_EXTENSIONS = (".png", ".gif", ".jpg", ".jpeg")
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_png_chunks(data):
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise ValueError("truncated PNG chunk")
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if len(body) != length:
+            raise ValueError("truncated PNG chunk")
+        chunks.append((kind, body))
+        pos += length + 12
+        if kind == b"IEND":
+            break
+    if not chunks or chunks[0][0] != b"IHDR" or chunks[-1][0] != b"IEND":
+        raise ValueError("malformed PNG file")
+    return chunks
+
+def png_chunk(kind, body):
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+def deflate(data, strategy):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+    return compressor.compress(data) + compressor.flush()
+
+def optimize_png(data):
+    chunks = read_png_chunks(data)
+    kinds = {kind for kind, _ in chunks}
+    if b"acTL" in kinds:
+        return data  # animated: the frames live in ancillary chunks
+    for kind in kinds:
+        if kind not in PNG_KEEP_CHUNKS and kind[:1].isupper():
+            return data  # unknown critical chunk, we cannot know what is safe to drop
+
+    # the row filters are kept as encoded, only the deflate stream is redone
+    raw = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    idat = min((deflate(raw, strategy) for strategy in ZLIB_STRATEGIES), key=len)
+
+    parts = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b"IDAT":
+            if idat is not None:
+                parts.append(png_chunk(b"IDAT", idat))
+                idat = None
+        elif kind in PNG_KEEP_CHUNKS:
+            parts.append(png_chunk(kind, body))
+    optimized = b"".join(parts)
+    return optimized if len(optimized) < len(data) else data
+
+def image_size(path):
+    # intrinsic (width, height) from the file header, or None if unknown
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+def jpeg_size(f):
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue  # markers without a length
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack(">H", length)[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            header = f.read(5)
+            if len(header) < 5:
+                return None
+            height, width = struct.unpack(">HH", header[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+def optimize_job(job):
+    source_path, cache_path = job
+    with open(source_path, "rb") as f:
+        data = f.read()
+    try:
+        optimized = optimize_png(data)
+    except (ValueError, zlib.error) as e:
+        logger.warning("warning: %s: not optimized, %s", source_path, e)
+        optimized = data
+    tmp_path = cache_path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(optimized)
+    os.replace(tmp_path, cache_path)
+    return len(data), len(optimized)
+
+
+class ImageOptimizer():
+    def __init__(self, cache_dir):
+        self.cache_dir = str(cache_dir)
+
+    def handles(self, rel):
+        return rel.lower().endswith(".png")
+
+    def cache_path(self, source_hash):
+        return os.path.join(self.cache_dir, f"{source_hash}.v{IMAGE_VERSION}.png")
+
+    def optimized(self, source_path, source_hash):
+        # path of the optimized copy of source_path, made on a cache miss
+        cache_path = self.cache_path(source_hash)
+        if not os.path.exists(cache_path):
+            self.optimize([(source_path, source_hash)])
+        return cache_path
+
+    def optimize(self, sources, jobs=1):
+        misses = []
+        for source_path, source_hash in sources:
+            cache_path = self.cache_path(source_hash)
+            if not os.path.exists(cache_path) and (source_path, cache_path) not in misses:
+                misses.append((source_path, cache_path))
+        if not misses:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if jobs > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(misses)), initializer=log.configure_logging,
+                                     initargs=(log.verbosity,)) as executor:
+                results = list(executor.map(optimize_job, misses))
+        else:
+            results = [optimize_job(job) for job in misses]
+        before = sum(size for size, _ in results)
+        after = sum(size for _, size in results)
+        logger.info("Optimized %d image(s): %d -> %d bytes", len(misses), before, after)
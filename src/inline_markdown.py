@@ -1,6 +1,18 @@
 from textnode import TextNode, TextType
 from htmlnode import *
-import re
+from collections import namedtuple
+from functools import lru_cache
+import logging, re
+
+logger = logging.getLogger("site.markdown")
+
+# bump whenever the same markdown would parse to a different tree, so cached
+# parse results from older versions are never reused
+PARSER_VERSION = 3
+
+# repeated inline fragments (list items, boilerplate lines) are parsed once
+# per process; entries, not bytes
+INLINE_CACHE_SIZE = 4096
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
@@ -87,28 +99,163 @@ def split_nodes_link(old_nodes):
             final_nodes.extend(current_nodes)
     return final_nodes
 
+INLINE_MARKUP = re.compile(r"[*_`\[!]")
+
+INLINE_DELIMITERS = {
+    "**": TextType.BOLD_TEXT,
+    "*": TextType.ITALIC_TEXT,
+    "_": TextType.ITALIC_TEXT,
+    "`": TextType.CODE_TEXT,
+}
+
+class InlineScanner():
+    # Every lookup of a closing character is cached, and positions only move
+    # forward, so each character of the text is searched at most once per
+    # closing character and malformed input cannot trigger backtracking.
+    def __init__(self, text):
+        self.text = text
+        self.next_seen = {}
+
+    def find(self, char, start):
+        pos = self.next_seen.get(char)
+        if pos is not None and (pos == -1 or pos >= start):
+            return pos
+        pos = self.text.find(char, start)
+        self.next_seen[char] = pos
+        return pos
+
+    def match_link(self, start):
+        # start is the index of "["; returns (text, url, end) or None
+        close = self.find("]", start + 1)
+        if close == -1:
+            return None
+        nested = self.find("[", start + 1)
+        if nested != -1 and nested < close:
+            return None
+        if not self.text.startswith("(", close + 1):
+            return None
+        url_close = self.find(")", close + 2)
+        if url_close == -1:
+            return None
+        nested = self.find("(", close + 2)
+        if nested != -1 and nested < url_close:
+            return None
+        return self.text[start + 1:close], self.text[close + 2:url_close], url_close + 1
+
+    def scan(self):
+        text = self.text
+        nodes = []
+        plain_start = 0
+        pos = 0
+        while True:
+            match = INLINE_MARKUP.search(text, pos)
+            if match is None:
+                break
+            pos = match.start()
+            char = text[pos]
+
+            if char == "!" or char == "[":
+                image = char == "!"
+                if image and not text.startswith("[", pos + 1):
+                    pos += 1
+                    continue
+                link = self.match_link(pos + 1 if image else pos)
+                if link is None:
+                    pos += 2 if image else 1
+                    continue
+                label, url, end = link
+                if plain_start < pos:
+                    nodes.append(TextNode(text[plain_start:pos], TextType.NORMAL_TEXT))
+                nodes.append(TextNode(label, TextType.IMAGE if image else TextType.LINK, url))
+                plain_start = pos = end
+                continue
+
+            delimiter = "**" if text.startswith("**", pos) else char
+            if delimiter == "**":
+                close = text.find("**", pos + 2)
+            else:
+                close = self.find(delimiter, pos + 1)
+            if close == -1:
+                raise Exception("Markdown syntax invalid")
+            if plain_start < pos:
+                nodes.append(TextNode(text[plain_start:pos], TextType.NORMAL_TEXT))
+            if close > pos + len(delimiter):
+                nodes.append(TextNode(text[pos + len(delimiter):close], INLINE_DELIMITERS[delimiter]))
+            plain_start = pos = close + len(delimiter)
+
+        if plain_start < len(text):
+            nodes.append(TextNode(text[plain_start:], TextType.NORMAL_TEXT))
+        return nodes
+
 def text_to_textnodes(text):
-    delim_matcher = {
-        "**": TextType.BOLD_TEXT,
-        "*": TextType.ITALIC_TEXT,
-        "_": TextType.ITALIC_TEXT,
-        "`": TextType.CODE_TEXT
-    }
-    nodes = [TextNode(text, TextType.NORMAL_TEXT)]
-    for delim in delim_matcher.keys():
-        delimited_nodes = split_nodes_delimiter(nodes, delim, delim_matcher[delim])
-        nodes = delimited_nodes
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_image(nodes)
-
-    return nodes
+    if not text:
+        return []
+    # plain text is by far the most common case and needs no scanning
+    if INLINE_MARKUP.search(text) is None:
+        return [TextNode(text, TextType.NORMAL_TEXT)]
+    return InlineScanner(text).scan()
+
+HEADING_LINE = re.compile(r"(#{1,6})\s+(\S.*)")
+UNORDERED_ITEM = re.compile(r"[-*+]\s+(.*)")
+ORDERED_ITEM = re.compile(r"\d+\.\s+(.*)")
+ORDERED_START = re.compile(r"\d+\.\s")
+# "```" or "```lang"; a line like "```x``` more" is inline code in a paragraph
+CODE_FENCE = re.compile(r"```[^`]*")
+
+Block = namedtuple("Block", ["type", "lines", "start", "end"])
+
+def classify_line(stripped):
+    if CODE_FENCE.fullmatch(stripped):
+        return "code"
+    if HEADING_LINE.match(stripped):
+        return "heading"
+    if stripped.startswith(">"):
+        return "quote"
+    if stripped[:1] in ("-", "*", "+") and stripped[1:2] == " ":
+        return "unordered_list"
+    if ORDERED_START.match(stripped):
+        return "ordered_list"
+    return "paragraph"
+
+def iter_blocks(source):
+    # One pass over the lines: the first line of a block decides its type,
+    # blank lines end it, and a fenced code block runs to its closing fence
+    # even across blank lines. start and end are 1-based line numbers.
+    if isinstance(source, str):
+        source = source.split("\n")
+    block_type = None
+    lines = []
+    start = number = 0
+    for number, line in enumerate(source, 1):
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+        if block_type == "code":
+            lines.append(line)
+            if stripped == "```":
+                yield Block("code", lines, start, number)
+                block_type = None
+            continue
+        if not stripped:
+            if block_type is not None:
+                yield Block(block_type, lines, start, number - 1)
+                block_type = None
+            continue
+        if block_type is None:
+            block_type = classify_line(stripped)
+            lines = [line]
+            start = number
+            if block_type == "heading":
+                yield Block(block_type, lines, start, number)
+                block_type = None
+            continue
+        lines.append(line)
+    if block_type is not None:
+        yield Block(block_type, lines, start, number)
 
 def markdown_to_blocks(markdown):
-    print(f"DEBUG - Original markdown: {repr(markdown)}")
-    pattern = r"\n\s*\n"
-    blocks = re.split(pattern, markdown)
-    processed_blocks = [block.strip() for block in blocks if block.strip() != ""]
-    print(f"DEBUG - Blocks after splitting: {processed_blocks}")
+    logger.debug("Original markdown: %r", markdown)
+    processed_blocks = ["\n".join(block.lines).strip() for block in iter_blocks(markdown)]
+    logger.debug("Blocks after splitting: %r", processed_blocks)
     return processed_blocks
 
 def determine_block_type(block):
@@ -133,66 +280,79 @@ def determine_block_type(block):
     return "paragraph"
     
 
+def iter_block_nodes(source):
+    # (block, node) pairs built one at a time, for documents too large to hold
+    # as a single tree
+    for block in iter_blocks(source):
+        yield block, BLOCK_BUILDERS[block.type](block.lines)
+
 def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+    logger.debug("Original markdown: %r", markdown)
     block_nodes = []
-
-    for block in blocks:
-        if not block.strip():
-            continue
-        block_type = determine_block_type(block)
-
-        match block_type:
-            case "paragraph":
-                block_node = create_paragraph_node(block)
-            case "heading":
-                block_node = create_heading_node(block)
-            case "code":
-                block_node = create_code_block(block)
-            case "unordered_list":
-                block_node = create_unordered_list_node(block)
-            case "ordered_list":
-                block_node = create_ordered_list_node(block)
-            case "quote":
-                block_node = create_quote_node(block)
-            case _:
-                continue
-
-        block_nodes.append(block_node)
+    for block in iter_blocks(markdown):
+        logger.debug("%s block at lines %d-%d", block.type, block.start, block.end)
+        block_nodes.append(BLOCK_BUILDERS[block.type](block.lines))
 
     if not block_nodes:
-        print("Warning: No block nodes created")
+        logger.warning("No block nodes created")
     parent_node = ParentNode("div", block_nodes)
     return parent_node
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
-    html_nodes = []
-    for t_node in text_nodes:
-        html_node = text_node_to_html_node(t_node)
-        html_nodes.append(html_node)
-
-    return html_nodes
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def render_inline(text):
+    # (tag, value, props) of each leaf, props as a tuple of pairs: an entry is
+    # shared by every page that repeats the fragment, so none of it can change
+    leaves = []
+    for t_node in text_to_textnodes(text):
+        node = text_node_to_html_node(t_node)
+        props = tuple(node.props.items()) if node.props is not None else None
+        leaves.append((node.tag, node.value, props))
+    return tuple(leaves)
+
+def set_inline_cache_size(maxsize):
+    # replaces the memo, counters included, unless it already has this size
+    global render_inline
+    if render_inline.cache_info().maxsize != maxsize:
+        render_inline = lru_cache(maxsize=maxsize)(render_inline.__wrapped__)
+
+def inline_cache_info():
+    # hits, misses, maxsize and currsize of this process's memo
+    return render_inline.cache_info()
+
+def clear_inline_cache():
+    render_inline.cache_clear()
 
-def create_code_block(block):
-    block_lines = block.strip().split("\n")
-    code_content = "\n".join([line.lstrip() for line in block_lines[1:-1]]) + "\n"
+def text_to_children(text):
+    # new leaves on every call, so a page can change its own without
+    # reaching the others
+    return [LeafNode(tag, value, dict(props) if props is not None else None)
+            for tag, value, props in render_inline(text)]
+
+def create_code_block(lines):
+    # content lines lose the fence's own indentation, nothing more
+    indent = len(lines[0]) - len(lines[0].lstrip())
+    closed = len(lines) > 1 and lines[-1].strip() == "```"
+    code_lines = []
+    for line in lines[1:-1] if closed else lines[1:]:
+        removable = len(line) - len(line.lstrip())
+        code_lines.append(line[min(indent, removable):])
+    code_content = "\n".join(code_lines) + "\n"
     text_node = TextNode(code_content, TextType.CODE_TEXT)
     code_html_node = text_node_to_html_node(text_node)
     pre_node = ParentNode("pre", [code_html_node])
 
     return pre_node
 
-def create_paragraph_node(block):
-    content = re.sub(r'\s+', ' ', block.strip())
+def create_paragraph_node(lines):
+    content = " ".join(" ".join(lines).split())
     children = text_to_children(content)
     if not children:
         children = [LeafNode("text", content)]
-    print(f"Paragraph children: {children}")
+    logger.debug("Paragraph children: %r", children)
     return ParentNode("p", children)
 
-def create_heading_node(block):
-    match = re.match(r"^(#+)\s+(.*)", block)
+def create_heading_node(lines):
+    match = HEADING_LINE.match(lines[0].strip())
     if not match:
         return None
     level = len(match.group(1))
@@ -201,54 +361,84 @@ def create_heading_node(block):
     children = text_to_children(content)
     return ParentNode(f"h{level}", children)
 
-def create_unordered_list_node(block):
+def create_list_items(lines, item_pattern):
     list_items = []
-    for line in block.strip().split("\n"):
-        if not line.strip():
-            continue
-        match = re.match(r"^\s*[-*+]\s+(.*)", line)
+    for line in lines:
+        match = item_pattern.match(line.strip())
         if match: 
             item_content = match.group(1)
             if item_content:
                 item_children = text_to_children(item_content)
                 list_items.append(ParentNode("li", item_children))
+    return list_items
 
-    return ParentNode("ul", list_items)
+def create_unordered_list_node(lines):
+    return ParentNode("ul", create_list_items(lines, UNORDERED_ITEM))
 
-def create_ordered_list_node(block):
-    list_items = []
-    for line in block.strip().split("\n"):
-        if not line.strip():
-            continue
-        match = re.match(r"^\s*\d+\.\s+(.*)", line)
-        if match: 
-            item_content = match.group(1)
-            if item_content:
-                item_children = text_to_children(item_content)
-                list_items.append(ParentNode("li", item_children))
+def create_ordered_list_node(lines):
+    return ParentNode("ol", create_list_items(lines, ORDERED_ITEM))
 
-    return ParentNode("ol", list_items)
+def create_quote_node(lines):
+    logger.debug("Quote block received: %r", lines)
 
-def create_quote_node(block):
-    print(f"DEBUG - Quote block received: {repr(block)}")
-
-    lines = []
-    for line in block.strip().split("\n"):
-        print(f"DEBUG - Processing line: {repr(line)}") 
+    quote_lines = []
+    for line in lines:
         line = line.strip()
         if line.startswith(">"):
-            line = line[1:].strip()
-            print(f"DEBUG - Line after removing '>': {repr(line)}")
-        lines.append(line)
-        
+            line = line[1:]
+        quote_lines.append(line)
 
-    content = " ".join(lines)
-    print(f"DEBUG - Final content for quote: {repr(content)}")
+    content = " ".join(" ".join(quote_lines).split())
+    logger.debug("Final content for quote: %r", content)
 
-    content = re.sub(r"\s+", " ", content).strip()
     children = text_to_children(content)
     return ParentNode("blockquote", children)
 
+BLOCK_BUILDERS = {
+    "paragraph": create_paragraph_node,
+    "heading": create_heading_node,
+    "code": create_code_block,
+    "unordered_list": create_unordered_list_node,
+    "ordered_list": create_ordered_list_node,
+    "quote": create_quote_node,
+}
+
+def split_front_matter(markdown):
+    # optional "---" delimited block of "key: value" lines at the top of a page
+    if not markdown.startswith("---\n"):
+        return {}, markdown
+    end = markdown.find("\n---", 3)
+    if end == -1:
+        return {}, markdown
+    body_start = markdown.find("\n", end + 4)
+    body = "" if body_start == -1 else markdown[body_start + 1:]
+
+    meta = {}
+    for line in markdown[4:end].split("\n"):
+        key, sep, value = line.partition(":")
+        if not sep or not key.strip():
+            continue
+        value = value.strip()
+        if value.startswith("[") and value.endswith("]"):
+            value = [item.strip() for item in value[1:-1].split(",") if item.strip()]
+        meta[key.strip()] = value
+    return meta, body
+
+def extract_markdown_refs(markdown, first_line=1):
+    # (kind, url, line) of every link and image outside fenced code, for the
+    # link checker; first_line is where markdown starts in its source file
+    # fenced code is found exactly as the block parser finds it
+    refs = []
+    for block in iter_blocks(markdown):
+        if block.type == "code":
+            continue
+        for number, line in enumerate(block.lines, first_line + block.start - 1):
+            if "](" not in line:
+                continue
+            refs.extend(("image", url, number) for _, url in extract_markdown_images(line))
+            refs.extend(("link", url, number) for _, url in extract_markdown_links(line))
+    return refs
+
 def extract_title(markdown):
     first_line = markdown.split("\n")[0]
     if not first_line.startswith("# "):
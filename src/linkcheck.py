@@ -0,0 +1,52 @@
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+import posixpath
+
+BrokenRef = namedtuple("BrokenRef", ["source", "line", "kind", "target", "reason"])
+
+
+def known_urls(page_outputs, static_files):
+    # every site-absolute path a reference may use, before the basepath is
+    # applied: "/blog/tom", "/blog/tom/" and "/blog/tom/index.html" are one page
+    urls = set()
+    for output in page_outputs:
+        urls.add("/" + output)
+        if output == "index.html":
+            urls.add("/")
+        elif output.endswith("/index.html"):
+            directory = "/" + output[:-len("/index.html")]
+            urls.add(directory)
+            urls.add(directory + "/")
+    urls.update("/" + rel for rel in static_files)
+    return urls
+
+def resolve_ref(target, page_url):
+    # the site-absolute path a reference points to, or None for references
+    # that leave the site (other hosts, mailto:, ...) or stay on the page
+    parts = urlsplit(target)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        base = page_url if page_url.endswith("/") else posixpath.dirname(page_url) + "/"
+        path = base + path
+    resolved = posixpath.normpath(path)
+    if path.endswith("/") and resolved != "/":
+        resolved += "/"
+    return resolved
+
+def check_refs(pages, refs, static_files, basepath="/", extra_outputs=()):
+    # pages and refs come from the site index; nothing is read from disk
+    urls = known_urls([page.output for page in pages] + list(extra_outputs), static_files)
+    page_urls = {page.source: page.url for page in pages}
+    broken = []
+    for ref in refs:
+        resolved = resolve_ref(ref.target, page_urls.get(ref.source, "/"))
+        if resolved is None or resolved in urls:
+            continue
+        reason = "no such page" if ref.kind == "link" else "no such file"
+        if basepath != "/" and resolved.startswith(basepath) and "/" + resolved[len(basepath):] in urls:
+            # the basepath is added when pages are written, so it must not be in the source
+            reason = f"already includes the basepath {basepath}"
+        broken.append(BrokenRef(ref.source, ref.line, ref.kind, ref.target, reason))
+    return broken
@@ -0,0 +1,118 @@
+from htmlnode import LeafNode, ParentNode
+from pageio import write_text
+from template import get_loader
+from urls import UrlRewriter
+from xml.sax.saxutils import escape
+import hashlib, logging, os
+
+logger = logging.getLogger("site")
+
+FEED_LIMIT = 20
+
+
+def absolute_url(site_url, basepath, url):
+    return site_url.rstrip("/") + basepath + url[1:]
+
+def atom_time(page):
+    # front matter dates are plain "YYYY-MM-DD"; atom wants a full timestamp
+    if page.date and len(page.date) == 10:
+        return page.date + "T00:00:00Z"
+    return page.date or page.modified
+
+def listing_node(section, pages):
+    items = []
+    for page in pages:
+        children = [LeafNode("a", escape(page.title), {"href": page.url})]
+        if page.date:
+            children.append(LeafNode(None, f" ({escape(page.date)})"))
+        items.append(ParentNode("li", children))
+    return ParentNode("div", [
+        LeafNode("h1", escape(section_title(section))),
+        ParentNode("ul", items),
+    ])
+
+def section_title(section):
+    return section.replace("-", " ").title()
+
+def render_listing(section, pages, template_path, basepath, options=None):
+    minify = options is not None and options.minify
+    template = get_loader(template_path, minify).layout()
+    if options is None:
+        rewriter = UrlRewriter(basepath)
+    else:
+        rewriter = UrlRewriter(basepath, options.asset_urls, options.image_sizes)
+    context = {"Title": section_title(section), "Content": listing_node(section, pages)}
+    return template.render_to_string(context, rewriter)
+
+def sitemap_xml(pages, site_url, basepath):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for page in sorted(pages, key=lambda page: page.url):
+        lines.append(f"<url><loc>{escape(absolute_url(site_url, basepath, page.url))}</loc>"
+                     f"<lastmod>{escape(page.date or page.modified[:10])}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+def atom_feed(section, pages, site_url, basepath):
+    pages = pages[:FEED_LIMIT]
+    feed_url = absolute_url(site_url, basepath, f"/{section}/feed.xml")
+    updated = max((atom_time(page) for page in pages), default="1970-01-01T00:00:00Z")
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<feed xmlns="http://www.w3.org/2005/Atom">',
+             f"<title>{escape(section_title(section))}</title>",
+             f"<id>{escape(feed_url)}</id>",
+             f'<link rel="self" href="{escape(feed_url)}"/>',
+             f"<updated>{updated}</updated>"]
+    for page in pages:
+        url = escape(absolute_url(site_url, basepath, page.url))
+        lines.append(f'<entry><title>{escape(page.title)}</title><id>{url}</id><link href="{url}"/>'
+                     f"<updated>{atom_time(page)}</updated><summary>{escape(page.summary)}</summary></entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+def publish_listings(index, template_path, basepath, options=None, site_url=None, feed_section="blog",
+                     inputs_hash="", sections=False, reserved=()):
+    # listings are rebuilt from the index alone, and only for sections whose
+    # pages changed, unless something every listing depends on changed.
+    # sections: write <section>/index.html for sections without an index.md;
+    # reserved: outputs static/ publishes, which are never listed over
+    output_dir = index.output_dir
+    settings = hashlib.sha256(f"{inputs_hash}\0{basepath}\0{site_url}\0{feed_section}".encode()).hexdigest()
+    rebuild_all = index.get_state("settings") != settings
+    previous = set(index.get_state("listings", []))
+    own_pages = {page.output for page in index.pages()}
+
+    written = set()
+    for section in index.sections() if sections else ():
+        output = f"{section}/index.html"
+        if output in own_pages:
+            continue  # the section has its own index.md
+        if output in reserved:
+            logger.warning("Not listing %s, static/ already publishes %s", section, output)
+            continue
+        written.add(output)
+        path = os.path.join(output_dir, output)
+        if rebuild_all or section in index.touched or not os.path.exists(path):
+            write_text(path, render_listing(section, index.pages(section), template_path, basepath, options))
+            logger.info("Listed %s -> %s", section, path)
+
+    if site_url:
+        feeds = {"sitemap.xml": lambda: sitemap_xml(index.pages(), site_url, basepath)}
+        if feed_section in index.sections():
+            feeds[f"{feed_section}/feed.xml"] = lambda: atom_feed(feed_section, index.pages(feed_section),
+                                                                   site_url, basepath)
+        for output, render in feeds.items():
+            written.add(output)
+            path = os.path.join(output_dir, output)
+            if rebuild_all or index.touched or not os.path.exists(path):
+                write_text(path, render())
+                logger.info("Wrote %s", path)
+
+    for output in sorted(previous - written - set(reserved)):
+        path = os.path.join(output_dir, output)
+        if os.path.exists(path):
+            os.unlink(path)
+            logger.info("Removed %s, nothing is listed there anymore.", path)
+    index.set_state("listings", sorted(written))
+    index.set_state("settings", settings)
+    index.touched = set()
@@ -0,0 +1,31 @@
+import logging, sys
+
+# (level of the "site" logger, level of the noisier "site.markdown" logger)
+VERBOSITY_LEVELS = {
+    "quiet": (logging.WARNING, logging.WARNING),
+    "normal": (logging.INFO, logging.WARNING),
+    "verbose": (logging.DEBUG, logging.INFO),
+    "debug": (logging.DEBUG, logging.DEBUG),
+}
+
+verbosity = "normal"
+
+def configure_logging(level="normal"):
+    global verbosity
+    if level not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity '{level}'")
+    verbosity = level
+    site_level, markdown_level = VERBOSITY_LEVELS[level]
+
+    site_logger = logging.getLogger("site")
+    for handler in list(site_logger.handlers):
+        site_logger.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stderr)
+    if level == "debug":
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    site_logger.addHandler(handler)
+    site_logger.setLevel(site_level)
+    site_logger.propagate = False
+    logging.getLogger("site.markdown").setLevel(markdown_level)
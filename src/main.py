@@ -1,108 +1,291 @@
-from inline_markdown import *
+from build import (PageBuildError, asset_optimizers, build_pages, check_site_links, collect_pages,
+                   precompress_site, prep_target_dir, publish_site_listings, render_inputs_hash, render_options,
+                   report_failures, write_asset_manifest)
+from changes import diff_outputs, snapshot_outputs, write_changes
+from inline_markdown import INLINE_CACHE_SIZE
+from manifest import BuildManifest, hash_file
+from plan import plan_build
+from shards import (SHARD_MANIFEST, ShardMergeError, load_shards, merge_shards, parse_shard, select_shard,
+                    write_shard_manifest)
+from site_index import SiteIndex
+from sync import COMPARE_MODES, COPY_METHODS, sync_tree
 from pathlib import Path
-import os, shutil, sys
-
-def main():
-    basepath = "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-        if not basepath.endswith("/"):
-            basepath += "/"
-    
-    current = Path(__file__).parent
-    source_dir = current.parent / "static"
-    target_dir = current.parent  / "docs"
-    #target_dir = current.parent  / "public"
-    copy_contents(source_dir, target_dir)
-
-    from_path = current.parent / "content/"
-    dest_path = current.parent / "docs"
-    #dest_path = current.parent / "public/"
-    template_path = current.parent / "template.html"
-
-    generate_pages_recursive(from_path, template_path, dest_path, basepath)
-    #generate_page(from_path, template_path, dest_path, basepath)
-    
-
-def copy_contents(source_dir, target_dir):
-    if not os.path.exists(source_dir):
-        raise Exception("invalid source path")
-    
-    if os.path.isdir(source_dir):
-        prep_target_dir(target_dir)
-
-        for item in os.listdir(source_dir):
-            source_path = os.path.join(source_dir, item)
-            target_path = os.path.join(target_dir, item)
-            
-            if os.path.isdir(source_path):
-                copy_contents(source_path, target_path)
-
-            elif os.path.isfile(source_path):
-                shutil.copy2(source_path, target_path)
-
-    elif os.path.isfile(source_dir):
-        raise Exception("Source path points to a file, not a directory.")
-
-def prep_target_dir(target):
-    if not os.path.exists(target):
-        os.makedirs(target, exist_ok=True)
-        print(f"The directory at {target} was created.")
-    else:
-        for item in os.listdir(target):
-            item_path = os.path.join(target, item)
-            if os.path.isfile(item_path) or os.path.islink(item_path):
-                os.unlink(item_path)
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-        print(f"The directory at {target} has been cleared.")
-
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using the template at {template_path}...")
-
-    # read md and save to var
-    markdown = open(from_path).read()
-    title = extract_title(markdown)
+from collections import namedtuple
+import argparse, logging, os, sys, time
+import log
 
+logger = logging.getLogger("site")
 
-    # read template and save to var
-    template = open(template_path).read()
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/.")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--clean", action="store_true",
+                        help="wipe the output directory and rebuild every page")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render pages with N worker processes (0 = one per CPU)")
+    parser.add_argument("--io-threads", type=int, default=4,
+                        help="threads per render process that prefetch markdown and write pages")
+    parser.add_argument("--inline-cache-size", type=int, default=INLINE_CACHE_SIZE, metavar="N",
+                        help="inline fragments each render process keeps parsed (0 = off)")
+    parser.add_argument("--stream-above", type=int, default=16, metavar="MB",
+                        help="render sources larger than this block by block in bounded memory (0 = always)")
+    parser.add_argument("--sync-compare", choices=COMPARE_MODES, default="mtime",
+                        help="how to decide whether a static file changed")
+    parser.add_argument("--copy-method", choices=COPY_METHODS, default="copy",
+                        help="how changed static files are written to the output")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="publish static files under content-hashed names and rewrite references")
+    parser.add_argument("--no-optimize-images", dest="optimize_images", action="store_false",
+                        help="copy PNG files as they are instead of recompressing them")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write compressed variants (.gz, .zst) next to text outputs; "
+                             "a build without it removes them")
+    parser.add_argument("--precompress-min-size", type=int, default=1024, metavar="BYTES",
+                        help="leave outputs smaller than this uncompressed")
+    parser.add_argument("--minify", action="store_true",
+                        help="drop insignificant whitespace from templates and minify CSS")
+    parser.add_argument("--no-parse-cache", dest="parse_cache", action="store_false",
+                        help="always parse markdown instead of reusing cached parse trees")
+    parser.add_argument("--parse-cache-size", type=int, default=64, metavar="MB",
+                        help="size limit for the on-disk parse cache")
+    parser.add_argument("--check-links", action="store_true",
+                        help="report links and images that point to missing pages or files")
+    parser.add_argument("--search", action="store_true",
+                        help="write a sharded client-side search index to search/")
+    parser.add_argument("--listings", action="store_true",
+                        help="write <section>/index.html listing the pages of sections that have no index.md")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="public URL of the site; enables sitemap.xml and the Atom feed")
+    parser.add_argument("--feed-section", default="blog",
+                        help="content section the Atom feed is built from")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="only build content and static files matching GLOB (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="leave out content and static files matching GLOB (repeatable)")
+    parser.add_argument("--report-changes", nargs="?", const="-", metavar="PATH",
+                        help="write the added, changed and removed outputs as JSON to PATH (default: stdout)")
+    parser.add_argument("--shard", type=shard_arg, metavar="I/N",
+                        help="build only the pages of shard I out of N, plus a shard manifest for --merge")
+    parser.add_argument("--merge", nargs="+", metavar="DIR",
+                        help="combine the outputs of every --shard build into docs/, then finish the site")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep rebuilding on changes and serve the output with live reload")
+    parser.add_argument("--port", type=int, default=8888,
+                        help="port for the --watch development server")
+    parser.add_argument("--poll-interval", type=float, default=0.2,
+                        help="seconds between change checks in --watch mode")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", dest="verbosity", action="store_const", const="quiet",
+                           help="only report warnings and errors")
+    verbosity.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const="verbose",
+                           help="also report skipped pages and copied files")
+    verbosity.add_argument("--debug", dest="verbosity", action="store_const", const="debug",
+                           help="dump parser internals as well")
+    parser.set_defaults(verbosity="normal")
+    args = parser.parse_args(argv)
+    if not args.basepath.endswith("/"):
+        args.basepath += "/"
+    if args.jobs < 0:
+        parser.error("--jobs must be zero or positive")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.io_threads < 1:
+        parser.error("--io-threads must be positive")
+    if args.merge and (args.shard or args.watch):
+        parser.error("--merge cannot be combined with --shard or --watch")
+    if args.shard and args.watch:
+        parser.error("--shard cannot be combined with --watch")
+    return args
 
-    #print(markdown)
-    #print(template)
+def shard_arg(text):
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
+SitePaths = namedtuple("SitePaths", ["root", "content", "static", "output", "template", "manifest", "parse_cache",
+                                     "image_cache", "minify_cache", "index"])
 
-    # convert md to html w. core fxns
-    content = markdown_to_html_node(markdown).to_html()
-    #print(content)
+def site_paths(root):
+    root = Path(root)
+    return SitePaths(
+        root=root,
+        content=root / "content",
+        static=root / "static",
+        output=root / "docs",
+        #output=root / "public",
+        template=root / "template.html",
+        manifest=root / ".build" / "manifest.json",
+        parse_cache=root / ".build" / "parse-cache",
+        image_cache=root / ".build" / "image-cache",
+        minify_cache=root / ".build" / "minify-cache",
+        index=root / ".build" / "site.db",
+    )
 
-    filled_template = template.replace("{{ Title }}", title).replace("{{ Content }}", content)
-    pathed_template = filled_template.replace("href=\"/", f"href=\"{basepath}").replace("src=\"/", f"src=\"{basepath}")
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    log.configure_logging(args.verbosity)
+
+    paths = site_paths(Path(__file__).parent.parent)
+    manifest = BuildManifest.load(str(paths.manifest), str(paths.root))
+    status = build_site(args, paths, manifest)
+    if args.watch:
+        from watch import watch_site
+        return watch_site(args, paths, manifest)
+    return status
+
+def build_site(args, paths, manifest):
+    if not args.report_changes:
+        return merge_site(args, paths, manifest) if args.merge else render_site(args, paths, manifest)
+    # --clean rewrites every file, so then only a content comparison will do
+    before = snapshot_outputs(paths.output, args.clean)
+    status = merge_site(args, paths, manifest) if args.merge else render_site(args, paths, manifest)
+    changes = diff_outputs(before, snapshot_outputs(paths.output, args.clean))
+    logger.info("Outputs: %d added, %d changed, %d removed", len(changes.added), len(changes.changed),
+                len(changes.removed))
+    write_changes(changes, args.report_changes)
+    return status
+
+def render_site(args, paths, manifest):
+    basepath = args.basepath
+    started = time.perf_counter()
+
+    if args.clean:
+        manifest.invalidate_all()
+        manifest.assets = {}
+        manifest.compressed = {}
+        prep_target_dir(paths.output)
+    plan = plan_build(paths, args.include, args.exclude)
+    synced = sync_tree(paths.static, paths.output, manifest.assets, args.sync_compare, args.copy_method,
+                       args.fingerprint, asset_optimizers(args, paths), args.jobs, plan.selected_assets(),
+                       plan.skipped_assets())
+    manifest.assets = synced.assets
+    logger.info("Synced static files: %d copied, %d removed, %d unchanged", len(synced.copied),
+                len(synced.removed), len(synced.assets) - len(synced.copied))
+    write_asset_manifest(paths.output, manifest.assets, args.fingerprint)
+
+    options = render_options(args, paths, manifest)
+    manifest.use_inputs(render_inputs_hash(paths, options), basepath)
+    pages = plan.page_paths()
+    # a shard renders its own pages; listings, search, link checks and
+    # precompression need every page and are left to --merge
+    own_pages = select_shard(plan.selected_pages(), paths.content, args.shard)
+    index = SiteIndex(paths.index, paths.content, paths.output)
+    broken = 0
+    built = False
+    try:
+        rendered = build_pages(own_pages, paths.template, basepath, manifest, args.jobs, options, index,
+                               plan.page_sizes())
+        built = True
+    except PageBuildError as e:
+        report_failures(e)
+        return 1
+    finally:
+        prune_site_pages(paths, manifest, index, pages)
+        if args.shard is None:
+            remove_shard_manifest(paths)
+            publish_site_listings(args, paths, manifest, options, index)
+            if args.check_links:
+                broken = check_site_links(args, paths, manifest, index)
+        elif built:
+            write_site_shard(args, paths, manifest, index, own_pages)
+        index.close()
+        if args.shard is None:
+            precompress_site(args, paths, manifest)
+        manifest.save()
+        if options.parse_cache is not None:
+            options.parse_cache.evict()
+    if args.shard is not None:
+        logger.info("Built %d of %d pages of shard %d/%d in %.2fs", rendered, len(own_pages), *args.shard,
+                    time.perf_counter() - started)
+    else:
+        logger.info("Built %d of %d pages in %.2fs", rendered, len(own_pages), time.perf_counter() - started)
+    return 1 if broken else 0
 
-    directory = os.path.dirname(dest_path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+def prune_site_pages(paths, manifest, index, pages):
+    for stale_output in manifest.prune_pages([source for source, _ in pages]):
+        if os.path.exists(stale_output):
+            os.unlink(stale_output)
+            logger.info("Removed %s, its source no longer exists.", stale_output)
+    index.prune([source for source, _ in pages])
 
-    with open(dest_path, "w") as f:
-        f.write(pathed_template)
+def write_site_shard(args, paths, manifest, index, own_pages):
+    # the pages this shard owns, with their index metadata, and a hash of
+    # every output it contributes, static files included
+    pages = {}
+    files = {}
+    for source, dest in own_pages:
+        key = index.source_key(source)
+        output = index.output_key(dest)
+        pages[key] = {"hash": manifest.pages[manifest.key(source)]["hash"], "output": output,
+                      "metadata": index.metadata(key)}
+        files[output] = hash_file(dest)
+    outputs = [entry["output"] for entry in manifest.assets.values()]
+    if args.fingerprint:
+        outputs.append("asset-manifest.json")
+    for output in outputs:
+        path = os.path.join(paths.output, output)
+        if os.path.exists(path):  # a filtered out asset may never have been built
+            files[output] = hash_file(path)
+    path = write_shard_manifest(paths.output, args.shard, args.basepath, manifest.inputs_hash, pages,
+                                manifest.assets, files)
+    logger.info("Wrote %s (%d pages, %d files)", path, len(pages), len(files))
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    if not os.path.exists(dir_path_content):
-        raise Exception("Source directory does not exist")
-    
-    for item in os.listdir(dir_path_content):
-        source_path = os.path.join(dir_path_content, item)
-        dest_path = os.path.join(dest_dir_path, item)
+def remove_shard_manifest(paths):
+    # left by an earlier --shard build, it is not part of the site
+    path = os.path.join(paths.output, SHARD_MANIFEST)
+    if os.path.exists(path):
+        os.unlink(path)
 
-        if os.path.isdir(source_path):
-            os.makedirs(dest_path, exist_ok=True)
-            generate_pages_recursive(source_path, template_path, dest_path, basepath)
+def merge_site(args, paths, manifest):
+    # the outputs of every --shard build become docs/, after which the
+    # site-wide steps the shards skipped run over the merged index
+    started = time.perf_counter()
+    if args.clean:
+        manifest.invalidate_all()
+        manifest.assets = {}
+        manifest.compressed = {}
+        prep_target_dir(paths.output)
+    # filtered out pages are not in the shards, but they are not deleted either
+    pages = collect_pages(paths.content, paths.output)
+    own_pages = collect_pages(paths.content, paths.output, args.include, args.exclude)
+    index = SiteIndex(paths.index, paths.content, paths.output)
+    try:
+        shards = load_shards(args.merge)
+        previous_assets = manifest.assets
+        manifest.assets = shards[0][1]["assets"]
+        options = render_options(args, paths, manifest)
+        inputs_hash = render_inputs_hash(paths, options)
+        merged = merge_shards(shards, paths.output, [index.source_key(source) for source, _ in own_pages],
+                              args.basepath, inputs_hash)
+    except ShardMergeError as e:
+        for conflict in e.conflicts:
+            logger.error("error: %s", conflict)
+        logger.error("error: %s", e)
+        index.close()
+        return 1
 
-        elif os.path.isfile(source_path) and source_path.endswith(".md"):
-            filename, ext = os.path.splitext(item)
-            new_filename = filename + ".html"
-            new_path = os.path.join(dest_dir_path, new_filename)
-            generate_page(source_path, template_path, new_path, basepath)
+    published = {entry["output"] for entry in merged.assets.values()}
+    for entry in previous_assets.values():
+        path = os.path.join(paths.output, entry["output"])
+        if entry["output"] not in published and os.path.exists(path):
+            os.unlink(path)
+    manifest.use_inputs(inputs_hash, args.basepath)
+    prune_site_pages(paths, manifest, index, pages)
+    # in content order, as a full build records them, so search doc ids match
+    for source, _ in own_pages:
+        entry = merged.pages[index.source_key(source)]
+        dest = os.path.join(paths.output, entry["output"])
+        manifest.record_page(source, entry["hash"], dest)
+        index.record_page(source, entry["hash"], dest, entry["metadata"])
+    publish_site_listings(args, paths, manifest, options, index)
+    broken = check_site_links(args, paths, manifest, index) if args.check_links else 0
+    index.close()
+    precompress_site(args, paths, manifest)
+    manifest.save()
+    logger.info("Merged %d pages from %d shard(s) in %.2fs", len(merged.pages), len(shards),
+                time.perf_counter() - started)
+    return 1 if broken else 0
 
 """
 def populate_template(markdown_path, template_path, basepath):
@@ -122,4 +305,4 @@ def populate_template(markdown_path, template_path, basepath):
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,103 @@
+import hashlib, json, os
+
+MANIFEST_VERSION = 2
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest():
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self.basepath = None
+        self.inputs_hash = None
+        self.pages = {}
+        self.assets = {}
+        self.compressed = {}
+
+    @classmethod
+    def load(cls, path, root):
+        manifest = cls(path, root)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # an unreadable manifest only costs us a full rebuild
+            return manifest
+        if data.get("version") != MANIFEST_VERSION:
+            return manifest
+        manifest.basepath = data.get("basepath")
+        manifest.inputs_hash = data.get("inputs_hash")
+        manifest.pages = data.get("pages", {})
+        manifest.assets = data.get("assets", {})
+        manifest.compressed = data.get("compressed", {})
+        return manifest
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "basepath": self.basepath,
+            "inputs_hash": self.inputs_hash,
+            "pages": self.pages,
+            "assets": self.assets,
+            "compressed": self.compressed,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def key(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def invalidate_all(self):
+        self.pages = {}
+
+    def use_inputs(self, inputs_hash, basepath):
+        # a different template, asset map or basepath changes every page
+        if inputs_hash != self.inputs_hash or basepath != self.basepath:
+            self.invalidate_all()
+        self.inputs_hash = inputs_hash
+        self.basepath = basepath
+
+    def page_is_stale(self, source_path, source_hash, dest_path):
+        entry = self.pages.get(self.key(source_path))
+        if entry is None:
+            return True
+        if entry["hash"] != source_hash or entry["output"] != self.key(dest_path):
+            return True
+        return not os.path.exists(dest_path)
+
+    def record_page(self, source_path, source_hash, dest_path):
+        self.pages[self.key(source_path)] = {
+            "hash": source_hash,
+            "output": self.key(dest_path),
+        }
+
+    def forget_page(self, source_path):
+        entry = self.pages.pop(self.key(source_path), None)
+        if entry is None:
+            return None
+        return os.path.join(self.root, entry["output"])
+
+    def prune_pages(self, seen_sources):
+        seen = {self.key(path) for path in seen_sources}
+        removed = []
+        for key in sorted(self.pages):
+            if key not in seen:
+                removed.append(os.path.join(self.root, self.pages.pop(key)["output"]))
+        return removed
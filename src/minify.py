@@ -0,0 +1,108 @@
+import os, re
+
+# bump when the minifier output changes so stale cache entries are not reused
+MINIFY_VERSION = 1
+
+HTML_TAG = re.compile(r"(<[^>]*>)")
+TAG_NAME = re.compile(r"<(/?)([!\w-]+)")
+WHITESPACE = re.compile(r"\s+")
+
+# whitespace next to these never renders, so it can go; between inline
+# tags ("<b>a</b> <i>b</i>") a single space is kept
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "base", "script", "style", "noscript",
+    "header", "footer", "main", "nav", "article", "section", "aside", "div", "p", "ul", "ol", "li",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "table", "thead", "tbody", "tr",
+    "td", "th", "figure", "figcaption", "form", "br",
+}
+# content of these is copied as written
+RAW_TAGS = {"pre", "code", "textarea", "script", "style"}
+
+CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/', re.S)
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+CSS_COLON = re.compile(r":\s+")
+CSS_LAST_SEMICOLON = re.compile(r";+}")
+
+
+def tag_name(tag):
+    match = TAG_NAME.match(tag)
+    if match is None:
+        return None, False
+    return match.group(2).lower(), match.group(1) == "/"
+
+def is_block(token):
+    return token is not None and tag_name(token)[0] in BLOCK_TAGS
+
+def minify_html(text):
+    # for template source: placeholders hold no angle brackets, so they pass
+    # through as ordinary text
+    tokens = HTML_TAG.split(text)
+    out = []
+    raw = None
+    for i, token in enumerate(tokens):
+        if i % 2:
+            name, closing = tag_name(token)
+            if raw is None and not closing and name in RAW_TAGS and not token.endswith("/>"):
+                raw = name
+            elif raw == name and closing:
+                raw = None
+            out.append(token)
+        elif raw is not None:
+            out.append(token)
+        elif token.isspace():
+            previous = tokens[i - 1] if i > 0 else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if not (is_block(previous) or is_block(following)):
+                out.append(" ")
+        elif token:
+            out.append(WHITESPACE.sub(" ", token))
+    return "".join(out)
+
+def minify_css_code(code):
+    code = WHITESPACE.sub(" ", code)
+    code = CSS_PUNCTUATION.sub(r"\1", code)
+    code = CSS_COLON.sub(":", code)
+    return CSS_LAST_SEMICOLON.sub("}", code)
+
+def minify_css(text):
+    # strings are kept as written and comments dropped
+    parts = []
+    last = 0
+    for match in CSS_TOKEN.finditer(text):
+        parts.append(minify_css_code(text[last:match.start()]))
+        if not match.group().startswith("/*"):
+            parts.append(match.group())
+        last = match.end()
+    parts.append(minify_css_code(text[last:]))
+    return CSS_LAST_SEMICOLON.sub("}", "".join(parts)).strip()
+
+
+class CssMinifier():
+    def __init__(self, cache_dir):
+        self.cache_dir = str(cache_dir)
+
+    def handles(self, rel):
+        return rel.lower().endswith(".css")
+
+    def cache_path(self, source_hash):
+        return os.path.join(self.cache_dir, f"{source_hash}.v{MINIFY_VERSION}.css")
+
+    def optimized(self, source_path, source_hash):
+        cache_path = self.cache_path(source_hash)
+        if not os.path.exists(cache_path):
+            self.optimize([(source_path, source_hash)])
+        return cache_path
+
+    def optimize(self, sources, jobs=1):
+        # cheap enough that a pool would cost more than it saves
+        for source_path, source_hash in sources:
+            cache_path = self.cache_path(source_hash)
+            if os.path.exists(cache_path):
+                continue
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(source_path, encoding="utf-8") as f:
+                text = minify_css(f.read())
+            tmp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
@@ -0,0 +1,90 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import filecmp, os, threading
+
+
+def read_text(path):
+    with open(path) as f:
+        return f.read()
+
+def same_bytes(path, data):
+    # size first, so most changed files are told apart without a read
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def write_text(path, text):
+    # an identical file is left alone, mtime included, so rsync's quick check
+    # and the change report see it as untouched; returns whether it wrote
+    data = text.encode()
+    if same_bytes(path, data):
+        return False
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+def replace_if_changed(tmp_path, path):
+    # for outputs written to tmp_path a chunk at a time
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.unlink(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+class PageIO():
+    # page reads run ahead of rendering and writes trail behind it on a small
+    # thread pool, so filesystem latency overlaps with CPU work
+    def __init__(self, threads=4, max_pending=None):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="page-io")
+        self.read_ahead = threads
+        self.slots = threading.BoundedSemaphore(max_pending or threads * 4)
+        self.lock = threading.Lock()
+        self.failures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read_all(self, paths):
+        # one future per path, in order, with up to read_ahead reads in flight;
+        # a None path is not read and yields None
+        pending = deque()
+        for path in paths:
+            pending.append(None if path is None else self.executor.submit(read_text, path))
+            if len(pending) > self.read_ahead:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    def write(self, path, text):
+        # blocks the renderer while max_pending writes are queued, so rendered
+        # pages cannot pile up in memory faster than they reach the disk
+        self.slots.acquire()
+        try:
+            self.executor.submit(self.write_job, path, text)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def write_job(self, path, text):
+        try:
+            write_text(path, text)
+        except Exception as e:
+            with self.lock:
+                self.failures.append((path, f"{type(e).__name__}: {e}"))
+        finally:
+            self.slots.release()
+
+    def close(self):
+        # every queued write is on disk and every handle closed once this returns
+        self.executor.shutdown(wait=True)
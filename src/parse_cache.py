@@ -0,0 +1,99 @@
+from htmlnode import LeafNode, ParentNode
+from inline_markdown import PARSER_VERSION, markdown_to_html_node
+import hashlib, logging, marshal, os, sys, zlib
+
+logger = logging.getLogger("site")
+
+# marshal's format follows the interpreter, so it is part of the key as well
+CACHE_FORMAT = f"{PARSER_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
+
+LEAF, PARENT = 0, 1
+
+
+def encode_node(node):
+    if node.children is None:
+        return (LEAF, node.tag, node.value, node.props)
+    return (PARENT, node.tag, node.props, tuple(encode_node(child) for child in node.children))
+
+def decode_node(data):
+    if data[0] == LEAF:
+        return LeafNode(data[1], data[2], data[3])
+    return ParentNode(data[1], [decode_node(child) for child in data[3]], data[2])
+
+
+class ParseCache():
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, markdown):
+        return hashlib.sha256(f"{CACHE_FORMAT}\n{markdown}".encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".bin")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            node = decode_node(marshal.loads(zlib.decompress(data)))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, IndexError, zlib.error):
+            # a damaged entry is just a miss, the next put replaces it
+            return None
+        try:
+            # the mtime is the recency stamp eviction goes by
+            os.utime(path)
+        except OSError:
+            pass
+        return node
+
+    def put(self, key, node):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(marshal.dumps(encode_node(node)), 6))
+        os.replace(tmp_path, path)
+
+    def parse(self, markdown):
+        key = self.key(markdown)
+        node = self.get(key)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = markdown_to_html_node(markdown)
+        self.put(key, node)
+        return node
+
+    def evict(self):
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        # least recently used entries go first
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.debug("Evicted %d parse cache entries, %d bytes remain", removed, total)
+        return removed
@@ -0,0 +1,92 @@
+from collections import namedtuple
+from fnmatch import fnmatchcase
+import os
+
+# what a build will do, worked out from one os.scandir pass over content/
+# and static/ before any page is rendered or file copied; the stat each
+# DirEntry caches is carried along so later stages do not stat again
+PageJob = namedtuple("PageJob", ["rel", "source", "dest", "size"])
+AssetJob = namedtuple("AssetJob", ["rel", "source", "size", "stat"])
+
+
+class BuildPlan():
+    # every page and asset that exists; --include/--exclude only pick the ones
+    # this build works on, the others are left alone, not taken as deleted
+    def __init__(self, pages, assets, include=(), exclude=()):
+        self.pages = pages
+        self.assets = assets
+        self.include = include
+        self.exclude = exclude
+
+    def is_selected(self, job):
+        return selected(job.rel, self.include, self.exclude)
+
+    def page_paths(self):
+        # the (source, dest) pairs the rest of the build works with
+        return [(job.source, job.dest) for job in self.pages]
+
+    def selected_pages(self):
+        return [(job.source, job.dest) for job in self.pages if self.is_selected(job)]
+
+    def page_sizes(self):
+        return {job.source: job.size for job in self.pages}
+
+    def selected_assets(self):
+        return [job for job in self.assets if self.is_selected(job)]
+
+    def skipped_assets(self):
+        return [job.rel for job in self.assets if not self.is_selected(job)]
+
+
+def matches(rel, pattern):
+    # the path or one of its directories; "*" also matches "/", so "drafts"
+    # and "drafts/*" both cover everything below drafts/
+    if fnmatchcase(rel, pattern):
+        return True
+    parts = rel.split("/")
+    return any(fnmatchcase("/".join(parts[:i]), pattern) for i in range(1, len(parts)))
+
+def selected(rel, include=(), exclude=()):
+    # globs match the path relative to content/ or static/
+    if include and not any(matches(rel, pattern) for pattern in include):
+        return False
+    return not any(matches(rel, pattern) for pattern in exclude)
+
+def scan_files(root):
+    # (rel, path, stat) of every file under root, in the order a sorted
+    # recursive listing gives
+    found = []
+    stack = [("", str(root))]
+    while stack:
+        prefix, directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                rel = prefix + entry.name
+                if entry.is_dir():
+                    stack.append((rel + "/", entry.path))
+                elif entry.is_file():
+                    found.append((rel, entry.path, entry.stat()))
+    found.sort(key=lambda item: item[0].split("/"))
+    return found
+
+def plan_pages(content_dir, output_dir, include=(), exclude=()):
+    if not os.path.isdir(content_dir):
+        raise Exception("Source directory does not exist")
+    return [PageJob(rel, path, os.path.join(output_dir, rel[:-len(".md")] + ".html"), stat.st_size)
+            for rel, path, stat in scan_files(content_dir)
+            if rel.endswith(".md") and selected(rel, include, exclude)]
+
+def plan_assets(static_dir):
+    if not os.path.isdir(static_dir):
+        raise Exception("invalid source path")
+    return [AssetJob(rel, path, stat.st_size, stat) for rel, path, stat in scan_files(static_dir)]
+
+def plan_build(paths, include=(), exclude=()):
+    return BuildPlan(plan_pages(paths.content, paths.output), plan_assets(paths.static), include, exclude)
+
+def schedule(pages, sizes=None):
+    # largest first, so parallel workers do not end the build waiting on one
+    # long page that happened to come last; ties keep their order
+    if not sizes:
+        return list(pages)
+    return sorted(pages, key=lambda page: -sizes.get(page[0], 0))
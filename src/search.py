@@ -0,0 +1,121 @@
+from collections import namedtuple
+from compress import remove_variants
+from pageio import write_text
+from site_index import SEARCH_TERM, SHARD_PREFIX
+import hashlib, json, logging, os
+
+logger = logging.getLogger("site")
+
+# search/index.json lists the shards and maps doc ids to [url, title]; a
+# query loads it plus search/<prefix>.json for each distinct term prefix
+SEARCH_DIR = "search"
+
+SearchStats = namedtuple("SearchStats", ["docs", "shards", "written", "total_bytes", "index_bytes",
+                                         "average_shard_bytes", "largest_shard_bytes"])
+
+
+def encode_postings(rows):
+    # {term: [gap, count, gap, count, ...]}, doc ids as gaps from the previous
+    # id so long postings lists stay short numbers
+    shard = {}
+    last = {}
+    for term, doc_id, count in rows:
+        postings = shard.setdefault(term, [])
+        postings.append(doc_id - last.get(term, 0))
+        postings.append(count)
+        last[term] = doc_id
+    return shard
+
+def decode_postings(postings):
+    # inverse of encode_postings for one term: [(doc id, count), ...]
+    decoded = []
+    doc_id = 0
+    for i in range(0, len(postings), 2):
+        doc_id += postings[i]
+        decoded.append((doc_id, postings[i + 1]))
+    return decoded
+
+def dump(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, sort_keys=True)
+
+def shard_name(prefix):
+    return f"{prefix}.json"
+
+def publish_search(index, basepath):
+    # only shards holding terms of changed pages are rewritten; the postings
+    # come from the site index, so no page is parsed again
+    output_dir = os.path.join(index.output_dir, SEARCH_DIR)
+    index_path = os.path.join(output_dir, "index.json")
+    shards = index.get_state("search_shards", {})  # prefix -> [bytes, sha256]
+    rebuild_all = index.get_state("search_basepath") != basepath or not os.path.exists(index_path)
+    prefixes = index.shard_prefixes()
+    touched = set(prefixes) | set(shards) if rebuild_all else index.touched_shards
+
+    written = 0
+    for prefix in sorted(touched):
+        path = os.path.join(output_dir, shard_name(prefix))
+        rows = index.postings(prefix)
+        if not rows:
+            shards.pop(prefix, None)
+            if os.path.exists(path):
+                os.unlink(path)
+            continue
+        data = dump(encode_postings(rows)).encode()
+        entry = [len(data), hashlib.sha256(data).hexdigest()]
+        if shards.get(prefix) == entry and os.path.exists(path):
+            continue  # a changed page whose terms in this shard did not change
+        write_text(path, data.decode())
+        shards[prefix] = entry
+        written += 1
+
+    docs = index.search_docs()
+    if touched or rebuild_all:
+        text = dump({
+            "basepath": basepath,
+            "prefix": SHARD_PREFIX,
+            "shards": prefixes,
+            "docs": {str(doc_id): [url, title] for doc_id, (url, title) in docs.items()},
+        })
+        write_text(index_path, text)
+        index.set_state("search_index_bytes", len(text.encode()))
+    index.set_state("search_shards", shards)
+    index.set_state("search_basepath", basepath)
+    index.touched_shards = set()
+
+    index_bytes = index.get_state("search_index_bytes", 0)
+    shard_sizes = [size for size, _ in shards.values()]
+    return SearchStats(
+        docs=len(docs),
+        shards=len(shard_sizes),
+        written=written,
+        total_bytes=index_bytes + sum(shard_sizes),
+        index_bytes=index_bytes,
+        average_shard_bytes=sum(shard_sizes) // len(shard_sizes) if shard_sizes else 0,
+        largest_shard_bytes=max(shard_sizes, default=0),
+    )
+
+def remove_search(index):
+    # --search was dropped: the files an earlier build wrote go, like a
+    # sitemap without --site-url; anything else under search/ is left alone
+    shards = index.get_state("search_shards")
+    if shards is None:
+        return []
+    output_dir = os.path.join(index.output_dir, SEARCH_DIR)
+    removed = []
+    for name in ["index.json"] + [shard_name(prefix) for prefix in sorted(shards)]:
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            os.unlink(path)
+            removed.append(f"{SEARCH_DIR}/{name}")
+        remove_variants(path)  # a --precompress build's .gz would keep search/ alive
+    try:
+        os.rmdir(output_dir)
+    except OSError:
+        pass  # already gone, or holds files that are not ours
+    index.forget_state("search_shards", "search_basepath", "search_index_bytes")
+    index.touched_shards = set()
+    return removed
+
+def query_shards(query):
+    # the shards a browser has to fetch to answer a query
+    return sorted({term[:SHARD_PREFIX] for term in SEARCH_TERM.findall(query.lower())})
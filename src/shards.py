@@ -0,0 +1,149 @@
+from collections import namedtuple
+from manifest import hash_file
+import hashlib, json, logging, os, shutil
+
+logger = logging.getLogger("site")
+
+# written next to a shard's outputs, so it travels with them to the merge
+SHARD_MANIFEST = "shard-manifest.json"
+SHARD_MANIFEST_VERSION = 1
+
+MergedShards = namedtuple("MergedShards", ["basepath", "inputs_hash", "pages", "assets", "files"])
+
+
+class ShardMergeError(Exception):
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} conflict(s) between shards, nothing was merged")
+
+
+def parse_shard(text):
+    # "2/4" -> (2, 4); shards are numbered from 1 like CI runners
+    index, sep, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, not {text!r}")
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard must look like i/N with 1 <= i <= N, not {text!r}")
+    return index, count
+
+def shard_of(source_key, count):
+    # a stable hash of the path relative to content/, so every machine puts
+    # a page in the same shard whatever the checkout location or Python's
+    # hash seed
+    digest = hashlib.sha256(source_key.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+def select_shard(pages, content_dir, shard):
+    if shard is None:
+        return pages
+    index, count = shard
+    return [(source, dest) for source, dest in pages
+            if shard_of(os.path.relpath(source, content_dir).replace(os.sep, "/"), count) == index]
+
+def write_shard_manifest(output_dir, shard, basepath, inputs_hash, pages, assets, files):
+    # pages: source key -> {"hash", "output", "metadata"}; files: output path
+    # -> sha256 of everything this shard contributes to the merged tree
+    data = {
+        "version": SHARD_MANIFEST_VERSION,
+        "shard": list(shard),
+        "basepath": basepath,
+        "inputs_hash": inputs_hash,
+        "pages": pages,
+        "assets": assets,
+        "files": files,
+    }
+    path = os.path.join(output_dir, SHARD_MANIFEST)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    return path
+
+def load_shards(shard_dirs):
+    shards = []
+    for directory in shard_dirs:
+        path = os.path.join(directory, SHARD_MANIFEST)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ShardMergeError([f"{path}: cannot read the shard manifest ({type(e).__name__}: {e})"])
+        if data.get("version") != SHARD_MANIFEST_VERSION:
+            raise ShardMergeError([f"{path}: unsupported shard manifest version {data.get('version')}"])
+        shards.append((str(directory), data))
+    return shards
+
+def published_assets(assets):
+    return {rel: (entry["output"], entry["hash"]) for rel, entry in assets.items()}
+
+def find_conflicts(shards, sources=None, basepath=None, inputs_hash=None):
+    # shards: [(directory, manifest data)]; everything that keeps them from
+    # adding up to exactly one site, and to the site this checkout would build
+    conflicts = []
+    counts = {data["shard"][1] for _, data in shards}
+    if len(counts) > 1:
+        conflicts.append(f"shards disagree on the shard count: {sorted(counts)}")
+    count = max(counts)
+    seen = {}
+    for directory, data in shards:
+        index = data["shard"][0]
+        if index in seen:
+            conflicts.append(f"shard {index}/{count} appears twice: {seen[index]} and {directory}")
+        seen[index] = directory
+    missing = sorted(set(range(1, count + 1)) - set(seen))
+    if missing:
+        conflicts.append(f"missing shard(s) {', '.join(f'{index}/{count}' for index in missing)}")
+
+    for directory, data in shards:
+        if basepath is not None and data["basepath"] != basepath:
+            conflicts.append(f"{directory} was built for basepath {data['basepath']}, not {basepath}")
+        if inputs_hash is not None and data["inputs_hash"] != inputs_hash:
+            conflicts.append(f"{directory} was built with other templates, static files or options")
+    first_dir, first = shards[0]
+    for directory, data in shards[1:]:
+        # sizes and mtimes differ between checkouts, the published files must not
+        if published_assets(data["assets"]) != published_assets(first["assets"]):
+            conflicts.append(f"{directory} and {first_dir} published different static files")
+
+    owners = {}
+    files = {}
+    for directory, data in shards:
+        for source in data["pages"]:
+            if source in owners:
+                conflicts.append(f"{source} was built by both {owners[source]} and {directory}")
+            owners[source] = directory
+        for output, digest in data["files"].items():
+            if output in files and files[output][1] != digest:
+                conflicts.append(f"{output} differs between {files[output][0]} and {directory}")
+            files.setdefault(output, (directory, digest))
+    if sources is not None:
+        for source in sorted(set(sources) - set(owners)):
+            conflicts.append(f"{source} is in no shard")
+        for source in sorted(set(owners) - set(sources)):
+            conflicts.append(f"{source} was built by {owners[source]} but is not in the content")
+    return conflicts
+
+def merge_shards(shards, output_dir, sources=None, basepath=None, inputs_hash=None):
+    # nothing is copied unless every shard is present and no two disagree;
+    # files identical in several shards (static assets) are copied once
+    conflicts = find_conflicts(shards, sources, basepath, inputs_hash)
+    if conflicts:
+        raise ShardMergeError(conflicts)
+
+    pages = {}
+    files = {}
+    for directory, data in shards:
+        pages.update(data["pages"])
+        for output, digest in data["files"].items():
+            if output in files:
+                continue
+            files[output] = digest
+            dest = os.path.join(output_dir, output)
+            if os.path.exists(dest) and hash_file(dest) == digest:
+                continue
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            shutil.copy2(os.path.join(directory, output), dest)
+            logger.debug("Merged %s from %s", output, directory)
+    first = shards[0][1]
+    logger.info("Merged %d shard(s): %d pages, %d files", len(shards), len(pages), len(files))
+    return MergedShards(first["basepath"], first["inputs_hash"], pages, first["assets"], files)
@@ -0,0 +1,281 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+import json, os, re, sqlite3
+
+# bump when the schema changes; an index from another version is rebuilt
+INDEX_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    source TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    output TEXT NOT NULL,
+    url TEXT NOT NULL,
+    section TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    tags TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    modified TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_by_section ON pages (section, date);
+CREATE TABLE IF NOT EXISTS refs (
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_by_source ON refs (source);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS terms (
+    source TEXT NOT NULL,
+    term TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS terms_by_source ON terms (source);
+CREATE INDEX IF NOT EXISTS terms_by_prefix ON terms (prefix, term);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+PAGE_COLUMNS = ["source", "hash", "output", "url", "section", "title", "date", "tags", "summary", "modified"]
+IndexedPage = namedtuple("IndexedPage", PAGE_COLUMNS)
+PageRef = namedtuple("PageRef", ["source", "kind", "target", "line"])
+
+# search postings are sharded by the first characters of each term
+SHARD_PREFIX = 2
+SEARCH_TERM = re.compile(r"\w{2,}")
+
+
+def iter_nodes(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.children:
+            stack.extend(reversed(node.children))
+
+def plain_text(node):
+    return "".join(child.value for child in iter_nodes(node) if child.value and child.tag != "img")
+
+def page_terms(node):
+    # term -> count over the text the inline parser produced for the page
+    counts = {}
+    for child in iter_nodes(node):
+        if child.value and child.tag != "img":
+            for term in SEARCH_TERM.findall(child.value.lower()):
+                counts[term] = counts.get(term, 0) + 1
+    return counts
+
+class MetadataCollector():
+    # builds the index metadata of a page one top-level block at a time
+    def __init__(self, search=False):
+        self.search = search
+        self.blocks = 0
+        self.summary = ""
+        self.terms = {}
+        self.refs = []
+
+    def add_block(self, node, refs=()):
+        self.blocks += 1
+        self.refs.extend(refs)
+        # the first paragraph with prose of its own, not just a link or image
+        if not self.summary and node.tag == "p" and \
+                any(leaf.tag is None and leaf.value.strip() for leaf in node.children or ()):
+            self.summary = plain_text(node)
+        if self.search:
+            for term, count in page_terms(node).items():
+                self.terms[term] = self.terms.get(term, 0) + count
+
+    def metadata(self, meta, title):
+        # small and picklable, so render workers can hand it back to the
+        # parent process
+        tags = meta.get("tags", [])
+        if isinstance(tags, str):
+            tags = [tags] if tags else []
+        return {
+            "title": meta.get("title") or title,
+            "date": meta.get("date") or None,
+            "tags": tags,
+            "summary": self.summary,
+            "refs": self.refs,
+            "terms": self.terms,
+        }
+
+def page_metadata(meta, title, content_node, refs=(), search=False):
+    collector = MetadataCollector(search)
+    for child in content_node.children or ():
+        collector.add_block(child)
+    collector.refs = list(refs)
+    return collector.metadata(meta, title)
+
+def section_of(source_key):
+    # "blog/tom/index.md" and "blog/tom.md" are in "blog"; "blog/index.md" is
+    # the section's own page
+    parts = source_key.split("/")
+    if len(parts) > 2 or (len(parts) == 2 and parts[1] != "index.md"):
+        return parts[0]
+    return ""
+
+def url_of(output_key):
+    if output_key == "index.html":
+        return "/"
+    if output_key.endswith("/index.html"):
+        return "/" + output_key[:-len("index.html")]
+    return "/" + output_key
+
+
+class SiteIndex():
+    def __init__(self, path, content_dir, output_dir):
+        self.path = str(path)
+        self.content_dir = str(content_dir)
+        self.output_dir = str(output_dir)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS pages; DROP TABLE IF EXISTS links; DROP TABLE IF EXISTS refs; "
+                                  "DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS terms; "
+                                  "DROP TABLE IF EXISTS state;")
+            self.db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.db.executescript(SCHEMA)
+        # sections whose pages were added, changed or removed since opening,
+        # and search shards whose postings did
+        self.touched = set()
+        self.touched_shards = set()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def source_key(self, path):
+        return os.path.relpath(path, self.content_dir).replace(os.sep, "/")
+
+    def output_key(self, path):
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def hashes(self):
+        return dict(self.db.execute("SELECT source, hash FROM pages"))
+
+    def record_page(self, source_path, source_hash, dest_path, metadata):
+        source = self.source_key(source_path)
+        output = self.output_key(dest_path)
+        modified = datetime.fromtimestamp(os.stat(source_path).st_mtime, timezone.utc)
+        row = IndexedPage(
+            source=source,
+            hash=source_hash,
+            output=output,
+            url=url_of(output),
+            section=section_of(source),
+            title=metadata["title"],
+            date=metadata["date"],
+            tags=json.dumps(metadata["tags"]),
+            summary=metadata["summary"],
+            modified=modified.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        previous = self.db.execute("SELECT section FROM pages WHERE source = ?", (source,)).fetchone()
+        if previous is not None:
+            self.touched.add(previous[0])
+        self.touched.add(row.section)
+        self.db.execute(f"INSERT OR REPLACE INTO pages VALUES ({', '.join('?' * len(PAGE_COLUMNS))})", row)
+        self.db.execute("DELETE FROM refs WHERE source = ?", (source,))
+        self.db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?)", [(source, *ref) for ref in metadata["refs"]])
+        self.forget_terms(source)
+        if metadata["terms"]:
+            self.db.execute("INSERT OR IGNORE INTO docs (source) VALUES (?)", (source,))
+            self.db.executemany("INSERT INTO terms VALUES (?, ?, ?, ?)",
+                                [(source, term, term[:SHARD_PREFIX], count) for term, count in metadata["terms"].items()])
+            self.touched_shards.update(term[:SHARD_PREFIX] for term in metadata["terms"])
+
+    def metadata(self, source_key):
+        # what record_page was given for the page, rebuilt from the tables
+        row = self.db.execute("SELECT title, date, tags, summary FROM pages WHERE source = ?",
+                              (source_key,)).fetchone()
+        if row is None:
+            return None
+        title, date, tags, summary = row
+        return {
+            "title": title,
+            "date": date,
+            "tags": json.loads(tags),
+            "summary": summary,
+            "refs": [[ref.kind, ref.target, ref.line] for ref in self.refs(source_key)],
+            "terms": dict(self.db.execute("SELECT term, count FROM terms WHERE source = ?", (source_key,))),
+        }
+
+    def remove_page(self, source_path):
+        source = self.source_key(source_path)
+        previous = self.db.execute("SELECT section FROM pages WHERE source = ?", (source,)).fetchone()
+        if previous is None:
+            return
+        self.touched.add(previous[0])
+        self.db.execute("DELETE FROM pages WHERE source = ?", (source,))
+        self.db.execute("DELETE FROM refs WHERE source = ?", (source,))
+        self.forget_terms(source)
+        self.db.execute("DELETE FROM docs WHERE source = ?", (source,))
+
+    def forget_terms(self, source):
+        rows = self.db.execute("SELECT DISTINCT prefix FROM terms WHERE source = ?", (source,))
+        self.touched_shards.update(row[0] for row in rows)
+        self.db.execute("DELETE FROM terms WHERE source = ?", (source,))
+
+    def prune(self, seen_sources):
+        seen = {self.source_key(path) for path in seen_sources}
+        for source in [row[0] for row in self.db.execute("SELECT source FROM pages")]:
+            if source not in seen:
+                self.remove_page(os.path.join(self.content_dir, source))
+
+    def pages(self, section=None):
+        # newest first; undated pages after dated ones, by title
+        query = f"SELECT {', '.join(PAGE_COLUMNS)} FROM pages"
+        params = ()
+        if section is not None:
+            query += " WHERE section = ?"
+            params = (section,)
+        query += " ORDER BY date IS NULL, date DESC, title"
+        return [IndexedPage(*row) for row in self.db.execute(query, params)]
+
+    def sections(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT section FROM pages WHERE section != '' ORDER BY section")]
+
+    def refs(self, source_key=None):
+        query = "SELECT source, kind, target, line FROM refs"
+        params = ()
+        if source_key is not None:
+            query += " WHERE source = ?"
+            params = (source_key,)
+        query += " ORDER BY source, line, rowid"
+        return [PageRef(*row) for row in self.db.execute(query, params)]
+
+    def search_docs(self):
+        rows = self.db.execute("SELECT docs.id, pages.url, pages.title FROM docs JOIN pages USING (source) "
+                               "ORDER BY docs.id")
+        return {doc_id: (url, title) for doc_id, url, title in rows}
+
+    def shard_prefixes(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT prefix FROM terms ORDER BY prefix")]
+
+    def postings(self, prefix):
+        # (term, doc id, count) rows of one shard, by term then document
+        return list(self.db.execute("SELECT term, docs.id, count FROM terms JOIN docs USING (source) "
+                                    "WHERE prefix = ? ORDER BY term, docs.id", (prefix,)))
+
+    def get_state(self, key, default=None):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_state(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+    def forget_state(self, *keys):
+        self.db.executemany("DELETE FROM state WHERE key = ?", [(key,) for key in keys])
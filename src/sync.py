@@ -0,0 +1,242 @@
+from collections import namedtuple
+from images import IMAGE_EXTENSIONS, image_size
+from manifest import hash_file
+import logging, os, shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("site")
+
+COMPARE_MODES = ("mtime", "size", "hash")
+COPY_METHODS = ("copy", "hardlink", "reflink", "range")
+
+# linux ioctl that shares the source's extents with the target (btrfs, xfs)
+FICLONE = 0x40049409
+
+SyncResult = namedtuple("SyncResult", ["assets", "copied", "removed"])
+
+
+def walk_files(source_dir):
+    files = []
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, source_dir)
+        for name in sorted(filenames):
+            rel = name if rel_dir == "." else os.path.join(rel_dir, name)
+            files.append(rel.replace(os.sep, "/"))
+    return files
+
+def needs_copy(source_stat, target_path, compare, source_hash, previous_hash):
+    try:
+        target_stat = os.stat(target_path)
+    except FileNotFoundError:
+        return True
+    if source_stat.st_size != target_stat.st_size:
+        return True
+    if compare == "size":
+        return False
+    if compare == "mtime":
+        return source_stat.st_mtime_ns != target_stat.st_mtime_ns
+    if previous_hash is None:
+        previous_hash = hash_file(target_path)
+    return source_hash != previous_hash
+
+def copy_file(source_path, target_path, method="copy"):
+    # replace rather than overwrite, so an old hardlink never writes through
+    # to its source file
+    if os.path.lexists(target_path):
+        os.unlink(target_path)
+    if method == "hardlink":
+        try:
+            os.link(source_path, target_path)
+            return
+        except OSError:
+            pass  # different filesystem, fall back to a plain copy
+    elif method == "reflink":
+        if clone_file(source_path, target_path, reflink=True):
+            return
+    elif method == "range":
+        if clone_file(source_path, target_path, reflink=False):
+            return
+    shutil.copy2(source_path, target_path)
+
+def clone_file(source_path, target_path, reflink):
+    if reflink and fcntl is None:
+        return False
+    if not reflink and not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(source_path, "rb") as src, open(target_path, "wb") as dst:
+            if reflink:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            else:
+                remaining = os.fstat(src.fileno()).st_size
+                offset = 0
+                while remaining > 0:
+                    sent = os.copy_file_range(src.fileno(), dst.fileno(), remaining, offset, offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+    except OSError:
+        return False
+    shutil.copystat(source_path, target_path)
+    return True
+
+def remove_output(target_dir, rel):
+    path = os.path.join(target_dir, rel)
+    if os.path.lexists(path):
+        os.unlink(path)
+    # drop directories the removal left empty, but never the target itself
+    directory = os.path.dirname(path)
+    while os.path.abspath(directory) != os.path.abspath(target_dir):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+def fingerprint_name(rel, digest):
+    root, ext = os.path.splitext(rel)
+    return f"{root}.{digest[:10]}{ext}"
+
+def source_digest(source_path, source_stat, previous):
+    # an untouched file keeps the hash, and so the name, it had last time
+    if previous and previous.get("hash") and previous.get("size") == source_stat.st_size \
+            and previous.get("mtime_ns") == source_stat.st_mtime_ns:
+        return previous["hash"]
+    return hash_file(source_path)
+
+def published_digest(copy_path, previous):
+    # the optimizer cache names its copies after the source hash and the
+    # optimizer version, so the same name means the same bytes as last time
+    if previous and previous.get("optimized") == os.path.basename(copy_path) and previous.get("published_hash"):
+        return previous["published_hash"]
+    return hash_file(copy_path)
+
+def find_optimizer(optimizers, rel):
+    for optimizer in optimizers or ():
+        if optimizer.handles(rel):
+            return optimizer
+    return None
+
+def sync_file(source_dir, target_dir, rel, previous=None, compare="mtime", method="copy", fingerprint=False,
+              optimizers=None, source_stat=None):
+    source_path = os.path.join(source_dir, rel)
+    if source_stat is None:
+        source_stat = os.stat(source_path)
+    optimizer = find_optimizer(optimizers, rel)
+    optimize = optimizer is not None
+    source_hash = None
+    if compare == "hash":
+        source_hash = hash_file(source_path)
+    elif fingerprint or optimize:
+        source_hash = source_digest(source_path, source_stat, previous)
+
+    if optimize:
+        # publish the cached optimized copy; the fingerprint and the target
+        # comparison go by its bytes, which change with the optimizer too
+        copy_path = optimizer.optimized(source_path, source_hash)
+        published_hash = published_digest(copy_path, previous)
+        output = fingerprint_name(rel, published_hash) if fingerprint else rel
+        target_path = os.path.join(target_dir, output)
+        previous_hash = None
+        if previous and previous.get("output") == output:
+            previous_hash = previous.get("published_hash")
+        copied = previous_hash != published_hash or needs_copy(os.stat(copy_path), target_path, compare,
+                                                               published_hash, previous_hash)
+    else:
+        output = fingerprint_name(rel, source_hash) if fingerprint else rel
+        target_path = os.path.join(target_dir, output)
+        previous_hash = None
+        if previous and previous.get("output") == output:
+            previous_hash = previous.get("hash")
+        copy_path = source_path
+        copied = needs_copy(source_stat, target_path, compare, source_hash, previous_hash)
+    if copied:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        copy_file(copy_path, target_path, method)
+        logger.debug("Copied %s", output)
+
+    entry = {
+        "output": output,
+        "hash": source_hash,
+        "size": source_stat.st_size,
+        "mtime_ns": source_stat.st_mtime_ns,
+    }
+    if optimize:
+        entry["optimized"] = os.path.basename(copy_path)
+        entry["published_hash"] = published_hash
+    if rel.lower().endswith(IMAGE_EXTENSIONS):
+        size = None
+        if previous and source_hash and previous_hash == source_hash:
+            size = previous.get("image_size")
+        if size is None:
+            size = image_size(source_path)
+        if size is not None:
+            entry["image_size"] = list(size)
+    return entry, copied
+
+def sync_tree(source_dir, target_dir, previous=None, compare="mtime", method="copy", fingerprint=False,
+              optimizers=None, jobs=1, files=None, keep=()):
+    # files: the AssetJobs of a build plan, whose stats are reused; without
+    # them the whole source directory is walked. keep: sources that still
+    # exist but are left out of this sync; their previous entries stay
+    if compare not in COMPARE_MODES:
+        raise ValueError(f"Unknown compare mode '{compare}'")
+    if method not in COPY_METHODS:
+        raise ValueError(f"Unknown copy method '{method}'")
+    if not os.path.isdir(source_dir):
+        raise Exception("invalid source path")
+    previous = previous or {}
+
+    if files is None:
+        stats = {rel: None for rel in walk_files(source_dir)}
+    else:
+        stats = {job.rel: job.stat for job in files}
+    for optimizer in optimizers or ():
+        # fill the optimizer caches up front so misses can be worked on in parallel
+        sources = []
+        for rel, source_stat in stats.items():
+            if find_optimizer(optimizers, rel) is optimizer:
+                source_path = os.path.join(source_dir, rel)
+                if source_stat is None:
+                    source_stat = stats[rel] = os.stat(source_path)
+                sources.append((source_path, source_digest(source_path, source_stat, previous.get(rel))))
+        optimizer.optimize(sources, jobs)
+
+    assets = {}
+    copied = []
+    for rel, source_stat in stats.items():
+        entry, was_copied = sync_file(source_dir, target_dir, rel, previous.get(rel), compare, method,
+                                      fingerprint, optimizers, source_stat)
+        assets[rel] = entry
+        if was_copied:
+            copied.append(entry["output"])
+
+    for rel in keep:
+        if rel in previous:
+            assets[rel] = previous[rel]
+
+    # only outputs this sync created before are ours to delete; pages and
+    # anything else in the target directory are left alone
+    outputs = {entry["output"] for entry in assets.values()}
+    removed = sorted({entry["output"] for entry in previous.values()} - outputs)
+    for rel in removed:
+        remove_output(target_dir, rel)
+        logger.debug("Removed %s, its source no longer exists.", rel)
+
+    return SyncResult(assets, copied, removed)
+
+def asset_urls(assets):
+    # site-absolute URL of each source asset -> URL it is published under
+    return {"/" + rel: "/" + entry["output"] for rel, entry in sorted(assets.items())
+            if entry["output"] != rel}
+
+def image_sizes(assets):
+    # site-absolute URL of each source image -> its intrinsic (width, height)
+    return {"/" + rel: tuple(entry["image_size"]) for rel, entry in sorted(assets.items())
+            if entry.get("image_size")}
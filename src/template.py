@@ -0,0 +1,149 @@
+from htmlnode import HTMLNode
+from manifest import hash_file
+from minify import minify_html
+import hashlib, os, re
+
+PLACEHOLDER = re.compile(r"\{\{\s*(>?)\s*([\w.-]+)\s*\}\}")
+URL_ATTRIBUTE = re.compile(r"""\b(?:href|src)=(["'])(.*?)\1""")
+
+TEXT, VARIABLE, URL = "text", "variable", "url"
+
+
+class Template():
+    def __init__(self, parts):
+        self.parts = parts
+
+    def render(self, context, rewriter=None):
+        for kind, value in self.parts:
+            if kind == TEXT:
+                yield value
+            elif kind == URL:
+                yield value if rewriter is None else rewriter.url(value)
+            else:
+                if value not in context:
+                    raise Exception(f"Template variable '{value}' has no value")
+                item = context[value]
+                if isinstance(item, HTMLNode):
+                    yield from item.iter_html(rewriter)
+                else:
+                    yield str(item)
+
+    def render_to_string(self, context, rewriter=None):
+        return "".join(self.render(context, rewriter))
+
+
+def split_urls(text):
+    # literal URLs are kept as separate parts so the basepath can be applied
+    # when the page is written instead of by scanning the finished document
+    parts = []
+    last = 0
+    for match in URL_ATTRIBUTE.finditer(text):
+        start, end = match.span(2)
+        parts.append((TEXT, text[last:start]))
+        parts.append((URL, match.group(2)))
+        last = end
+    parts.append((TEXT, text[last:]))
+    return [part for part in parts if part[0] != TEXT or part[1]]
+
+def merge_text(parts):
+    merged = []
+    for part in parts:
+        if merged and part[0] == TEXT and merged[-1][0] == TEXT:
+            merged[-1] = (TEXT, merged[-1][1] + part[1])
+        else:
+            merged.append(part)
+    return merged
+
+
+def file_stamps(files):
+    stamps = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamps.append((path, None))
+            continue
+        stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+class TemplateLoader():
+    def __init__(self, template_path, minify=False):
+        self.template_path = str(template_path)
+        self.minify = minify
+        root = os.path.dirname(self.template_path)
+        self.layouts_dir = os.path.join(root, "layouts")
+        self.partials_dir = os.path.join(root, "partials")
+        self.compiled = {}
+
+    def layout_path(self, name):
+        if not name:
+            return self.template_path
+        # the name comes from front matter, so it may only pick a file
+        # directly inside layouts/
+        if ".." in name or "/" in name or "\\" in name:
+            raise Exception(f"Invalid layout name '{name}'")
+        return os.path.join(self.layouts_dir, f"{name}.html")
+
+    def layout(self, name=None):
+        return self.load(self.layout_path(name))
+
+    def load(self, path):
+        # recompile when the template or any partial it pulled in has changed
+        cached = self.compiled.get(path)
+        if cached is not None:
+            files, stamps, template = cached
+            if file_stamps(files) == stamps:
+                return template
+        files = []
+        template = Template(merge_text(self.compile_file(path, (), files)))
+        self.compiled[path] = (files, file_stamps(files), template)
+        return template
+
+    def compile_file(self, path, including, files):
+        if path in including:
+            raise Exception(f"Template partial {path} includes itself")
+        if not os.path.exists(path):
+            raise Exception(f"Template {path} does not exist")
+        with open(path) as f:
+            source = f.read()
+        files.append(path)
+        if self.minify:
+            # done once per compile, so rendering pays nothing for it
+            source = minify_html(source)
+
+        parts = []
+        last = 0
+        for match in PLACEHOLDER.finditer(source):
+            parts.extend(split_urls(source[last:match.start()]))
+            is_partial, name = match.groups()
+            if is_partial:
+                partial_path = os.path.join(self.partials_dir, f"{name}.html")
+                parts.extend(self.compile_file(partial_path, including + (path,), files))
+            else:
+                parts.append((VARIABLE, name))
+            last = match.end()
+        parts.extend(split_urls(source[last:]))
+        return parts
+
+    def inputs_hash(self):
+        # the default template plus every layout and partial it could use
+        digest = hashlib.sha256(hash_file(self.template_path).encode())
+        for directory in (self.layouts_dir, self.partials_dir):
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    digest.update(f"{os.path.basename(directory)}/{name}:{hash_file(path)}".encode())
+        return digest.hexdigest()
+
+
+loaders = {}
+
+def get_loader(template_path, minify=False):
+    # one loader per process, so pool workers compile each template once
+    key = (str(template_path), minify)
+    if key not in loaders:
+        loaders[key] = TemplateLoader(template_path, minify)
+    return loaders[key]
@@ -0,0 +1,41 @@
+import unittest
+
+from benchmark import compare_stages
+from corpus import CorpusSpec, generate_corpus
+from inline_markdown import markdown_to_html_node
+
+
+class TestCorpus(unittest.TestCase):
+    def test_seeded(self):
+        spec = CorpusSpec(seed=7, pages=5, blocks=10)
+        self.assertEqual(generate_corpus(spec), generate_corpus(CorpusSpec(seed=7, pages=5, blocks=10)))
+        self.assertNotEqual(generate_corpus(spec), generate_corpus(CorpusSpec(seed=8, pages=5, blocks=10)))
+
+    def test_shape(self):
+        corpus = generate_corpus(CorpusSpec(pages=20, blocks=30, link_density=1.0, code_mix=0.5, depth=0))
+        self.assertEqual(len(corpus), 20)
+        for path, markdown in corpus.items():
+            self.assertEqual(path.count("/"), 1)
+            self.assertIn("](/", markdown)
+            self.assertIn("```", markdown)
+            markdown_to_html_node(markdown).to_html()
+
+
+class TestCompareStages(unittest.TestCase):
+    def test_regression_detected(self):
+        baseline = {"stages": {"build": {"seconds": 1.0, "peak_bytes": 100}}}
+        current = {"stages": {"build": {"seconds": 1.5, "peak_bytes": 100}}}
+        _, regressions = compare_stages(current, baseline, 0.2)
+        self.assertEqual(regressions, ["build: time +50.0%"])
+        _, regressions = compare_stages(current, baseline, 0.6)
+        self.assertEqual(regressions, [])
+
+    def test_new_stage_is_not_a_regression(self):
+        current = {"stages": {"build": {"seconds": 1.0, "peak_bytes": 100}}}
+        rows, regressions = compare_stages(current, {"stages": {}}, 0.2)
+        self.assertEqual(regressions, [])
+        self.assertEqual(rows[0][2], None)
+
+
+if __name__ == "__main__":
+    unittest.main()
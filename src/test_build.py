@@ -0,0 +1,133 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from build import PageBuildError, RenderOptions, build_pages, collect_pages, generate_page
+import log
+
+
+class TestPageBuild(unittest.TestCase):
+    def setUp(self):
+        # pool workers log at the verbosity they are handed
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.write("index.md", "# Home\n\nWelcome")
+        self.write("blog/b/index.md", "# B\n\nSecond")
+        self.write("blog/a/index.md", "# A\n\nFirst")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.content, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.docs, name)) as f:
+            return f.read()
+
+    def test_collect_pages_is_sorted(self):
+        pages = collect_pages(self.content, self.docs)
+        self.assertEqual(
+            [os.path.relpath(dest, self.docs) for _, dest in pages],
+            ["blog/a/index.html", "blog/b/index.html", "index.html"],
+        )
+
+    def test_parallel_matches_serial(self):
+        pages = collect_pages(self.content, self.docs)
+        build_pages(pages, self.template, "/", jobs=1)
+        serial = [self.read(os.path.relpath(dest, self.docs)) for _, dest in pages]
+        build_pages(pages, self.template, "/", jobs=2)
+        parallel = [self.read(os.path.relpath(dest, self.docs)) for _, dest in pages]
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial[0], "<title>A</title><div><h1>A</h1><p>First</p></div>")
+
+    def test_errors_are_reported_per_page(self):
+        self.write("blog/a/index.md", "no title here")
+        pages = collect_pages(self.content, self.docs)
+        with self.assertRaises(PageBuildError) as cm:
+            build_pages(pages, self.template, "/", jobs=2)
+        failures = cm.exception.failures
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0][0].endswith(os.path.join("blog", "a", "index.md")))
+        self.assertIn("No h1 header detected", failures[0][1])
+        self.assertEqual(self.read("index.html"), "<title>Home</title><div><h1>Home</h1><p>Welcome</p></div>")
+
+    def test_write_errors_are_reported_per_page(self):
+        os.makedirs(self.docs)
+        with open(os.path.join(self.docs, "blog"), "w") as f:
+            f.write("a file where a directory should be")
+        pages = collect_pages(self.content, self.docs)
+        with self.assertRaises(PageBuildError) as cm:
+            build_pages(pages, self.template, "/")
+        self.assertEqual([os.path.relpath(source, self.content) for source, _ in cm.exception.failures],
+                         [os.path.join("blog", "a", "index.md"), os.path.join("blog", "b", "index.md")])
+        self.assertEqual(self.read("index.html"), "<title>Home</title><div><h1>Home</h1><p>Welcome</p></div>")
+
+
+class TestStreamPage(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, markdown):
+        with open(os.path.join(self.tmp.name, "page.md"), "w") as f:
+            f.write(markdown)
+
+    def render(self, stream_above, search=True):
+        source = os.path.join(self.tmp.name, "page.md")
+        dest = os.path.join(self.tmp.name, "out", "page.html")
+        metadata = generate_page(source, self.template, dest, "/site/",
+                                 RenderOptions(search=search, stream_above=stream_above))
+        return dest, metadata
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_streamed_matches_buffered(self):
+        markdown = ("---\ntitle: Big\ntags: a, b\n---\n# Heading\n\nSome [link](/a) text.\n\n"
+                    "```\n[not](/ref)\n```\n\n- one\n- ![img](/b.png)\n\n> quote\n")
+        self.write(markdown)
+        dest, buffered = self.render(None)
+        expected = self.read(dest)
+        dest, streamed = self.render(0)
+        self.assertEqual(self.read(dest), expected)
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(streamed["refs"], [("link", "/a", 7), ("image", "/b.png", 14)])
+
+    def peak_memory(self, blocks):
+        self.write("# Big\n\n" + "Some **bold** text with `code` in it.\n\n" * blocks)
+        tracemalloc.start()
+        try:
+            self.render(0, search=False)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_does_not_grow_with_the_document(self):
+        # refs and search terms are kept for the index, so leave them out
+        self.peak_memory(10)  # template and regex compilation
+        small = self.peak_memory(1000)
+        large = self.peak_memory(8000)
+        self.assertLess(large, small * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
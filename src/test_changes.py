@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from changes import diff_outputs
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+import log
+
+
+class TestChanges(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/a.md", "# A")
+        self.write("content/b.md", "# B")
+        self.write("static/index.css", "body {}")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, *argv):
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            build_site(parse_args(["/", "--no-optimize-images", "--report-changes", *argv]), self.paths, manifest)
+        return json.loads(stdout.getvalue())
+
+    def test_diff(self):
+        changes = diff_outputs({"a": 1, "b": 1, "c": 1}, {"a": 1, "b": 2, "d": 1})
+        self.assertEqual(changes._asdict(), {"added": ["d"], "changed": ["b"], "removed": ["c"]})
+
+    def test_report(self):
+        self.assertEqual(self.build(), {"added": ["a.html", "b.html", "index.css", "index.html"],
+                                        "changed": [], "removed": []})
+        self.assertEqual(self.build(), {"added": [], "changed": [], "removed": []})
+        self.write("content/a.md", "# A\n\nNew text.")
+        os.unlink(os.path.join(self.paths.content, "b.md"))
+        self.assertEqual(self.build(), {"added": [], "changed": ["a.html"], "removed": ["b.html"]})
+
+    def test_identical_pages_are_not_rewritten(self):
+        self.build()
+        index = os.path.join(self.paths.output, "index.html")
+        os.utime(index, ns=(1, 1))
+        # --search renders every page again, but their html comes out the same
+        changes = self.build("--search")
+        self.assertEqual(changes["changed"], [])
+        self.assertTrue(all(rel.startswith("search/") for rel in changes["added"]))
+        self.assertEqual(os.stat(index).st_mtime_ns, 1)
+        self.assertEqual(self.build("--search", "--clean"), {"added": [], "changed": [], "removed": []})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import CODECS, compress_outputs, remove_compressed
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+import log
+
+
+class TestCompressOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.write("index.html", "<p>page</p>" * 200)
+        self.write("index.css", "body {}")
+        self.write("images/tom.png", "png bytes" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def test_text_outputs_above_threshold(self):
+        result = compress_outputs(self.root, {}, min_size=1024)
+        self.assertEqual(result.compressed, ["index.html"])
+        with gzip.open(os.path.join(self.root, "index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), "<p>page</p>" * 200)
+        self.assertFalse(self.exists("index.css.gz"))
+        self.assertFalse(self.exists("images/tom.png.gz"))
+        for suffix in CODECS:
+            self.assertTrue(self.exists("index.html" + suffix))
+
+    def test_unchanged_outputs_are_skipped(self):
+        first = compress_outputs(self.root, {})
+        self.assertEqual(compress_outputs(self.root, first.entries).compressed, [])
+        self.write("index.html", "<p>changed</p>" * 200)
+        self.assertEqual(compress_outputs(self.root, first.entries).compressed, ["index.html"])
+
+    def test_variants_of_removed_outputs_are_removed(self):
+        first = compress_outputs(self.root, {})
+        os.unlink(os.path.join(self.root, "index.html"))
+        second = compress_outputs(self.root, first.entries, jobs=2)
+        self.assertEqual(second.removed, ["index.html"])
+        self.assertFalse(self.exists("index.html.gz"))
+
+    def test_remove_compressed(self):
+        first = compress_outputs(self.root, {})
+        self.assertEqual(remove_compressed(self.root, first.entries), ["index.html"])
+        self.assertFalse(self.exists("index.html.gz"))
+        self.assertTrue(self.exists("index.html"))
+
+
+class TestPrecompressBuild(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        for name, text in {"template.html": "<title>{{ Title }}</title>{{ Content }}",
+                           "content/index.md": "# Home\n\n" + "Welcome home. " * 200,
+                           "static/index.css": "body { color: red; }\n" * 100}.items():
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def build(self, *argv):
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        self.assertEqual(build_site(parse_args(["/", "--no-optimize-images", *argv]), self.paths, manifest), 0)
+
+    def variants(self):
+        return sorted(name for name in os.listdir(self.paths.output) if name.endswith((".gz", ".zst")))
+
+    def test_build_without_precompress_removes_variants(self):
+        self.build("--minify", "--precompress")
+        self.assertIn("index.html.gz", self.variants())
+        self.assertIn("index.css.gz", self.variants())
+        self.build()
+        self.assertEqual(self.variants(), [])
+        self.build("--precompress")
+        with gzip.open(os.path.join(self.paths.output, "index.html.gz"), "rt") as f:
+            with open(os.path.join(self.paths.output, "index.html")) as page:
+                self.assertEqual(f.read(), page.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 
+from io import StringIO
+
 from htmlnode import *
 from textnode import TextType, TextNode
 
@@ -80,6 +82,33 @@ class TestHTMLNode(unittest.TestCase):
         html_string = "<section><header><h1>Title</h1></header><nav><a>Link 1</a><a>Link 2</a></nav><footer><p>Copyright</p></footer></section>"
         self.assertEqual(complex_node.to_html(), html_string)
     
+    def test_deep_tree(self):
+        node = LeafNode("span", "deep")
+        for _ in range(5000):
+            node = ParentNode("div", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<div>" * 5000 + "<span>deep</span>"))
+        self.assertTrue(html.endswith("</div>" * 5000))
+
+    def test_write_html(self):
+        node = ParentNode(
+            "ul",
+            [ParentNode("li", [LeafNode("b", "one")]), ParentNode("li", [LeafNode(None, "two")])],
+            {"class": "items"},
+        )
+        buffer = StringIO()
+        node.write_html(buffer)
+        self.assertEqual(buffer.getvalue(), "<ul class=\"items\"><li><b>one</b></li><li>two</li></ul>")
+        self.assertEqual(buffer.getvalue(), node.to_html())
+
+    def test_nodes_are_slotted(self):
+        for node in (LeafNode("b", "x"), ParentNode("p", []), TextNode("x", TextType.NORMAL_TEXT)):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_invalid_text_type(self):
+        with self.assertRaises(Exception):
+            text_node_to_html_node(TextNode("x", "underline"))
+
     def test_node_conversions(self):
         node = TextNode("normal", TextType.NORMAL_TEXT)
         converted_normal = text_node_to_html_node(node)
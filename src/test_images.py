@@ -0,0 +1,86 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from images import ImageOptimizer, image_size, optimize_png, png_chunk, read_png_chunks, PNG_SIGNATURE
+from urls import UrlRewriter
+
+
+def make_png(width=4, height=3):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    raw = b"".join(b"\x00" + bytes(range(width * 3)) for _ in range(height))
+    return b"".join([
+        PNG_SIGNATURE,
+        png_chunk(b"IHDR", ihdr),
+        png_chunk(b"tEXt", b"Comment\x00" + b"x" * 200),
+        png_chunk(b"tRNS", b"\x00\x00\x00\x00\x00\x00"),
+        png_chunk(b"IDAT", zlib.compress(raw, 0)),
+        png_chunk(b"IEND", b""),
+    ])
+
+
+class TestOptimizePng(unittest.TestCase):
+    def test_lossless_and_strips_ancillary_chunks(self):
+        data = make_png()
+        optimized = optimize_png(data)
+        self.assertLess(len(optimized), len(data))
+        kinds = [kind for kind, _ in read_png_chunks(optimized)]
+        self.assertEqual(kinds, [b"IHDR", b"tRNS", b"IDAT", b"IEND"])
+        pixels = lambda png: zlib.decompress(b"".join(b for k, b in read_png_chunks(png) if k == b"IDAT"))
+        self.assertEqual(pixels(optimized), pixels(data))
+
+    def test_keeps_colour_chunks(self):
+        chunks = read_png_chunks(make_png())
+        colour = [(b"gAMA", struct.pack(">I", 45455)), (b"sRGB", b"\x00"),
+                  (b"iCCP", b"icc\x00\x00" + zlib.compress(b"profile")), (b"tIME", b"\x07\xe8\x01\x01\x00\x00\x00")]
+        data = PNG_SIGNATURE + b"".join(png_chunk(kind, body) for kind, body in chunks[:1] + colour + chunks[1:])
+        kinds = [kind for kind, _ in read_png_chunks(optimize_png(data))]
+        self.assertEqual(kinds, [b"IHDR", b"gAMA", b"sRGB", b"iCCP", b"tRNS", b"IDAT", b"IEND"])
+
+    def test_rejects_non_png(self):
+        with self.assertRaises(ValueError):
+            optimize_png(b"GIF89a")
+
+    def test_cache_by_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "a.png")
+            with open(source, "wb") as f:
+                f.write(make_png())
+            optimizer = ImageOptimizer(os.path.join(tmp, "cache"))
+            with self.assertLogs("site") as logs:
+                path = optimizer.optimized(source, "abc")
+            self.assertIn("Optimized 1 image(s)", logs.output[0])
+            self.assertEqual(path, optimizer.optimized(source, "abc"))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), optimize_png(make_png()))
+
+
+class TestImageSize(unittest.TestCase):
+    def size_of(self, data):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            return image_size(f.name)
+
+    def test_formats(self):
+        self.assertEqual(self.size_of(make_png(7, 5)), (7, 5))
+        self.assertEqual(self.size_of(b"GIF89a" + struct.pack("<HH", 9, 2) + b"\x00" * 8), (9, 2))
+        jpeg = b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", 4) + b"\x00\x00" \
+            + b"\xff\xc0" + struct.pack(">HBHH", 11, 8, 6, 10) + b"\x00" * 6
+        self.assertEqual(self.size_of(jpeg), (10, 6))
+        self.assertIsNone(self.size_of(b"body {}"))
+
+    def test_img_attributes(self):
+        rewriter = UrlRewriter("/x/", images={"/images/a.png": (7, 5)})
+        self.assertEqual(rewriter.props("img", {"src": "/images/a.png", "alt": "a"}), {
+            "src": "/x/images/a.png", "alt": "a", "width": "7", "height": "5",
+            "loading": "lazy", "decoding": "async",
+        })
+        props = {"src": "/images/b.png", "alt": "b"}
+        self.assertIs(UrlRewriter(images={"/images/a.png": (7, 5)}).props("img", props), props)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import inline_markdown
 from inline_markdown import *
 
 from textnode import TextNode, TextType
@@ -204,6 +205,26 @@ class TestInlineMarkdown(unittest.TestCase):
         ]
         assert text_to_textnodes(input) == expected
 
+    def test_text_to_textnodes_literal_spans(self):
+        input = "Run `a*b*c` or see [the docs](https://example.com/snake_case_page)"
+        expected = [
+            TextNode("Run ", TextType.NORMAL_TEXT),
+            TextNode("a*b*c", TextType.CODE_TEXT),
+            TextNode(" or see ", TextType.NORMAL_TEXT),
+            TextNode("the docs", TextType.LINK, "https://example.com/snake_case_page"),
+        ]
+        self.assertListEqual(text_to_textnodes(input), expected)
+
+    def test_text_to_textnodes_unmatched_delimiter(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("This is **not closed")
+
+    def test_text_to_textnodes_pathological_brackets(self):
+        text = "[a](" * 20000 + "[b](c)"
+        nodes = text_to_textnodes(text)
+        self.assertEqual(nodes[-1], TextNode("b", TextType.LINK, "c"))
+        self.assertEqual(nodes[0], TextNode("[a](" * 20000, TextType.NORMAL_TEXT))
+
     def test_markdown_to_blocks(self):
         md = "# This is a heading\n\nThis is a paragraph of text. It has some **bold** and *italic* words inside of it.\n\n* This is the first list item in a list block\n* This is a list item\n* This is another list item"
         expected_blocks = [
@@ -300,15 +321,105 @@ class TestInlineMarkdown(unittest.TestCase):
             "<div><ol><li>First item</li><li>Second item</li><li>Third item with <code>code</code></li></ol></div>",
         )
 
+    def test_iter_blocks_offsets(self):
+        md = "# Title\nIntro line\n\n- one\n- two\n\n\n> quote"
+        blocks = [(block.type, block.start, block.end) for block in iter_blocks(md)]
+        self.assertEqual(blocks, [
+            ("heading", 1, 1),
+            ("paragraph", 2, 2),
+            ("unordered_list", 4, 5),
+            ("quote", 8, 8),
+        ])
+
+    def test_codeblock_with_blank_lines(self):
+        md = "Before\n\n```\ndef f():\n\n    return 1\n```\n\nAfter"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><p>Before</p><pre><code>def f():\n\n    return 1\n</code></pre><p>After</p></div>",
+        )
+
+    def test_iter_blocks_accepts_lines(self):
+        lines = iter(["# Title\n", "\n", "Body\n"])
+        self.assertEqual([block.type for block in iter_blocks(lines)], ["heading", "paragraph"])
+
+    def test_inline_code_is_not_a_fence(self):
+        md = "```x``` is inline code here\n\nSecond paragraph\n\n## Heading"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p><code>x</code> is inline code here</p><p>Second paragraph</p><h2>Heading</h2></div>",
+        )
+        html = markdown_to_html_node("```python\nx = 1\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>x = 1\n</code></pre></div>")
+
+    def test_extract_markdown_refs_after_inline_code(self):
+        md = "```x``` and [a](/a)\n\n```py\n[not](/b)\n```\n\n[c](/c)"
+        self.assertEqual(extract_markdown_refs(md), [("link", "/a", 1), ("link", "/c", 7)])
+
+    def test_extract_markdown_refs(self):
+        md = "# T\n\n[home](/) and ![x](/x.png)\n\n```\n[not](/a/link)\n```\n[b](b)"
+        self.assertEqual(extract_markdown_refs(md, 5), [
+            ("image", "/x.png", 7), ("link", "/", 7), ("link", "b", 12),
+        ])
+
     def test_extract_title(self):
         md = "# Title!\n## subtitle"
         title = extract_title(md)
         self.assertEqual(title, "Title!")
 
+    def test_split_front_matter(self):
+        md = "---\nlayout: post\ntags: [elves, history]\n---\n# Title\n\nBody"
+        meta, body = split_front_matter(md)
+        self.assertEqual(meta, {"layout": "post", "tags": ["elves", "history"]})
+        self.assertEqual(body, "# Title\n\nBody")
+        self.assertEqual(split_front_matter("# Title"), ({}, "# Title"))
+
     def test_no_title(self):
         md = "There's no title here.\n# But there's an h1 here..."
         with self.assertRaises(Exception):
             extract_title(md)
 
+class TestInlineMemo(unittest.TestCase):
+    def tearDown(self):
+        set_inline_cache_size(INLINE_CACHE_SIZE)
+
+    def test_repeated_fragments_hit(self):
+        set_inline_cache_size(8)
+        md = "- a **shared** item\n- a **shared** item\n\n> a **shared** item"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html.count("a <b>shared</b> item"), 3)
+        info = inline_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+
+    def test_each_caller_gets_its_own_leaves(self):
+        set_inline_cache_size(8)
+        first = text_to_children("see [home](/)")
+        first[1].props["href"] = "/changed"
+        second = text_to_children("see [home](/)")
+        self.assertEqual(inline_cache_info().hits, 1)
+        self.assertIsNot(first[1], second[1])
+        self.assertEqual(second[1].to_html(), '<a href="/">home</a>')
+        self.assertEqual(inline_markdown.render_inline("see [home](/)")[1], ("a", "home", (("href", "/"),)))
+
+    def test_clear(self):
+        set_inline_cache_size(8)
+        text_to_children("plain")
+        clear_inline_cache()
+        self.assertEqual(inline_cache_info().currsize, 0)
+
+    def test_disabled(self):
+        set_inline_cache_size(0)
+        text_to_children("plain")
+        text_to_children("plain")
+        info = inline_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 2, 0))
+
+    def test_errors_are_not_cached(self):
+        set_inline_cache_size(8)
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                text_to_children("unclosed **bold")
+        self.assertEqual(inline_cache_info().currsize, 0)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
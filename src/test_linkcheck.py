@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from linkcheck import check_refs, resolve_ref
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from site_index import IndexedPage, PageRef
+import log
+
+
+def page(source, output, url):
+    return IndexedPage(source, "", output, url, "", "", None, "[]", "", "")
+
+
+class TestCheckRefs(unittest.TestCase):
+    def setUp(self):
+        self.pages = [
+            page("index.md", "index.html", "/"),
+            page("blog/tom/index.md", "blog/tom/index.html", "/blog/tom/"),
+        ]
+        self.static = ["images/tom.png", "index.css"]
+
+    def check(self, kind, target, basepath="/"):
+        return check_refs(self.pages, [PageRef("blog/tom/index.md", kind, target, 4)], self.static, basepath)
+
+    def test_resolve_ref(self):
+        self.assertEqual(resolve_ref("../x/", "/blog/tom/"), "/blog/x/")
+        self.assertEqual(resolve_ref("/a%20b.png?v=1#top", "/"), "/a b.png")
+        self.assertIsNone(resolve_ref("https://www.boot.dev", "/"))
+        self.assertIsNone(resolve_ref("mailto:me@example.com", "/"))
+        self.assertIsNone(resolve_ref("#intro", "/"))
+
+    def test_valid_refs(self):
+        for kind, target in [("link", "/"), ("link", "/blog/tom"), ("link", "/blog/tom/#x"),
+                             ("link", "../../"), ("image", "/images/tom.png"), ("link", "//cdn.example.com/a")]:
+            with self.subTest(target=target):
+                self.assertEqual(self.check(kind, target), [])
+
+    def test_broken_refs(self):
+        broken = self.check("image", "/images/x.png")
+        self.assertEqual([(ref.source, ref.line, ref.target) for ref in broken],
+                         [("blog/tom/index.md", 4, "/images/x.png")])
+        self.assertEqual(len(self.check("link", "/blog/tomm")), 1)
+
+    def test_basepath_in_source(self):
+        broken = self.check("link", "/static-site/blog/tom", "/static-site/")
+        self.assertIn("basepath", broken[0].reason)
+
+
+class TestCheckLinksBuild(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+
+    def test_reports_with_line_numbers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = site_paths(tmp)
+            files = {
+                "template.html": "{{ Content }}",
+                "content/index.md": "---\nlayout:\n---\n# Home\n\n[blog](/blog)\n\n![me](/images/me.png)",
+                "content/blog/post/index.md": "# Post\n\n[home](/)",
+                "static/index.css": "body {}",
+            }
+            for name, text in files.items():
+                path = os.path.join(tmp, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(text)
+            manifest = BuildManifest.load(str(paths.manifest), str(paths.root))
+            with self.assertLogs("site", "ERROR") as logs:
+                status = build_site(parse_args(["-q", "--listings", "--check-links"]), paths, manifest)
+            self.assertEqual(status, 1)
+            self.assertEqual(len(logs.output), 1)
+            self.assertIn(os.path.join("content", "index.md") + ":8: broken image /images/me.png", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
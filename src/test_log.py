@@ -0,0 +1,38 @@
+import logging
+import unittest
+
+import log
+
+
+class TestLogging(unittest.TestCase):
+    def tearDown(self):
+        site_logger = logging.getLogger("site")
+        for handler in list(site_logger.handlers):
+            site_logger.removeHandler(handler)
+        site_logger.setLevel(logging.NOTSET)
+        site_logger.propagate = True
+        logging.getLogger("site.markdown").setLevel(logging.NOTSET)
+        log.verbosity = "normal"
+
+    def test_default_skips_parser_dumps(self):
+        log.configure_logging("normal")
+        self.assertTrue(logging.getLogger("site").isEnabledFor(logging.INFO))
+        self.assertFalse(logging.getLogger("site.markdown").isEnabledFor(logging.DEBUG))
+
+    def test_levels(self):
+        log.configure_logging("quiet")
+        self.assertFalse(logging.getLogger("site").isEnabledFor(logging.INFO))
+        log.configure_logging("verbose")
+        self.assertTrue(logging.getLogger("site").isEnabledFor(logging.DEBUG))
+        self.assertFalse(logging.getLogger("site.markdown").isEnabledFor(logging.DEBUG))
+        log.configure_logging("debug")
+        self.assertTrue(logging.getLogger("site.markdown").isEnabledFor(logging.DEBUG))
+        self.assertEqual(len(logging.getLogger("site").handlers), 1)
+
+    def test_unknown_level(self):
+        with self.assertRaises(ValueError):
+            log.configure_logging("loud")
+
+
+if __name__ == "__main__":
+    unittest.main()
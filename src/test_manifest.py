@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from manifest import BuildManifest, hash_file
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.path = os.path.join(self.root, ".build", "manifest.json")
+        self.source = os.path.join(self.root, "index.md")
+        self.dest = os.path.join(self.root, "index.html")
+        with open(self.source, "w") as f:
+            f.write("# Title\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_new_page_is_stale(self):
+        manifest = BuildManifest.load(self.path, self.root)
+        self.assertTrue(manifest.page_is_stale(self.source, hash_file(self.source), self.dest))
+
+    def test_round_trip(self):
+        with open(self.dest, "w") as f:
+            f.write("<h1>Title</h1>")
+        manifest = BuildManifest.load(self.path, self.root)
+        manifest.use_inputs("template", "/")
+        manifest.record_page(self.source, hash_file(self.source), self.dest)
+        manifest.save()
+
+        loaded = BuildManifest.load(self.path, self.root)
+        loaded.use_inputs("template", "/")
+        self.assertEqual(loaded.pages, {"index.md": {"hash": hash_file(self.source), "output": "index.html"}})
+        self.assertFalse(loaded.page_is_stale(self.source, hash_file(self.source), self.dest))
+        self.assertTrue(loaded.page_is_stale(self.source, "changed", self.dest))
+
+    def test_template_or_basepath_change_invalidates(self):
+        manifest = BuildManifest(self.path, self.root)
+        manifest.use_inputs("template", "/")
+        manifest.record_page(self.source, "hash", self.dest)
+        manifest.use_inputs("template", "/static-site/")
+        self.assertEqual(manifest.pages, {})
+
+        manifest.record_page(self.source, "hash", self.dest)
+        manifest.use_inputs("other template", "/static-site/")
+        self.assertEqual(manifest.pages, {})
+
+    def test_prune_pages(self):
+        manifest = BuildManifest(self.path, self.root)
+        manifest.record_page(self.source, "hash", self.dest)
+        self.assertEqual(manifest.prune_pages([]), [self.dest])
+        self.assertEqual(manifest.pages, {})
+
+    def test_corrupt_manifest_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        manifest = BuildManifest.load(self.path, self.root)
+        self.assertEqual(manifest.pages, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from minify import minify_css, minify_html
+from template import TemplateLoader
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_whitespace_between_block_tags(self):
+        self.assertEqual(
+            minify_html("<!doctype html>\n<html>\n  <head>\n    <title>{{ Title }}</title>\n  </head>\n</html>\n"),
+            "<!doctype html><html><head><title>{{ Title }}</title></head></html>",
+        )
+
+    def test_inline_whitespace_is_collapsed_not_removed(self):
+        self.assertEqual(minify_html("<p><b>a</b>\n   <i>b</i>  and\n c</p>"), "<p><b>a</b> <i>b</i> and c</p>")
+
+    def test_pre_and_code_are_preserved(self):
+        source = "<div>\n  <pre><code>  x = 1\n\n  y</code></pre>\n</div>"
+        self.assertEqual(minify_html(source), "<div><pre><code>  x = 1\n\n  y</code></pre></div>")
+
+    def test_template_compiled_minified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write('<html>\n  <body>\n    <a href="/">{{ Title }}</a>\n  </body>\n</html>\n')
+            html = TemplateLoader(path, minify=True).layout().render_to_string({"Title": "Home"})
+            self.assertEqual(html, '<html><body><a href="/">Home</a></body></html>')
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_minify(self):
+        source = '/* theme */\nbody {\n  color: #fff;\n  font-family: "A  B", serif;\n}\n\nh1,\nh2 > a:hover {\n  margin: 0 auto;\n}\n'
+        self.assertEqual(minify_css(source), 'body{color:#fff;font-family:"A  B",serif}h1,h2>a:hover{margin:0 auto}')
+
+    def test_calc_and_media_spacing_kept(self):
+        self.assertEqual(
+            minify_css("@media screen and (max-width: 600px) {\n  p { width: calc(100% - 2px); }\n}"),
+            "@media screen and (max-width:600px){p{width:calc(100% - 2px)}}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from pageio import PageIO, replace_if_changed, write_text
+
+
+class TestPageIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_in_order(self):
+        paths = []
+        for i in range(10):
+            path = os.path.join(self.root, f"{i}.md")
+            with open(path, "w") as f:
+                f.write(f"page {i}")
+            paths.append(path)
+        with PageIO(threads=2) as io:
+            texts = [read.result() for read in io.read_all(paths)]
+        self.assertEqual(texts, [f"page {i}" for i in range(10)])
+
+    def test_writes_are_flushed_on_close(self):
+        with PageIO(threads=2, max_pending=1) as io:
+            for i in range(20):
+                io.write(os.path.join(self.root, "out", f"{i}.html"), f"<p>{i}</p>")
+        for i in range(20):
+            with open(os.path.join(self.root, "out", f"{i}.html")) as f:
+                self.assertEqual(f.read(), f"<p>{i}</p>")
+        self.assertEqual(io.failures, [])
+
+    def test_backpressure(self):
+        release = threading.Event()
+        io = PageIO(threads=1, max_pending=2)
+        io.executor.submit(release.wait)  # keep the only thread busy
+        io.write(os.path.join(self.root, "a.html"), "a")
+        io.write(os.path.join(self.root, "b.html"), "b")
+        blocked = threading.Thread(target=io.write, args=(os.path.join(self.root, "c.html"), "c"))
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+        release.set()
+        blocked.join(5)
+        self.assertFalse(blocked.is_alive())
+        io.close()
+        self.assertTrue(os.path.exists(os.path.join(self.root, "c.html")))
+
+    def test_write_failures_are_collected(self):
+        with open(os.path.join(self.root, "blocker"), "w") as f:
+            f.write("")
+        target = os.path.join(self.root, "blocker", "index.html")
+        with PageIO() as io:
+            io.write(target, "x")
+        self.assertEqual([path for path, _ in io.failures], [target])
+
+    def test_identical_writes_are_skipped(self):
+        path = os.path.join(self.root, "out", "page.html")
+        self.assertTrue(write_text(path, "<p>é</p>"))
+        os.utime(path, ns=(1, 1))
+        self.assertFalse(write_text(path, "<p>é</p>"))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertTrue(write_text(path, "<p>e</p>"))
+        self.assertTrue(write_text(path, "<p>a</p>"))  # same size, other bytes
+        with open(path) as f:
+            self.assertEqual(f.read(), "<p>a</p>")
+
+    def test_replace_if_changed(self):
+        path = os.path.join(self.root, "page.html")
+        for text, replaced in (("a", True), ("a", False), ("b", True)):
+            with open(path + ".tmp", "w") as f:
+                f.write(text)
+            self.assertEqual(replace_if_changed(path + ".tmp", path), replaced)
+            self.assertFalse(os.path.exists(path + ".tmp"))
+        with open(path) as f:
+            self.assertEqual(f.read(), "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+
+from inline_markdown import markdown_to_html_node
+from parse_cache import ParseCache
+
+MARKDOWN = "# Title\n\nSome **bold** text and a [link](/blog/tom)\n\n- one\n- two\n\n```\ncode\n```"
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(os.path.join(self.tmp.name, "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        first = self.cache.parse(MARKDOWN)
+        second = self.cache.parse(MARKDOWN)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+    def test_hit_survives_new_instance(self):
+        self.cache.parse(MARKDOWN)
+        cache = ParseCache(self.cache.directory)
+        cache.parse(MARKDOWN)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_damaged_entry_is_a_miss(self):
+        self.cache.parse(MARKDOWN)
+        with open(self.cache.path(self.cache.key(MARKDOWN)), "wb") as f:
+            f.write(b"garbage")
+        node = self.cache.parse(MARKDOWN)
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(node.to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+    def test_evicts_least_recently_used(self):
+        sources = [f"# Page {i}\n\n" + "word " * 200 for i in range(3)]
+        for i, source in enumerate(sources):
+            self.cache.parse(source)
+            stamp = time.time_ns() - (10 - i) * 10 ** 9
+            os.utime(self.cache.path(self.cache.key(source)), ns=(stamp, stamp))
+        # reading page 0 makes it the most recently used
+        self.cache.parse(sources[0])
+        size = os.path.getsize(self.cache.path(self.cache.key(sources[0])))
+        self.cache.max_bytes = size * 2
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(self.cache.path(self.cache.key(sources[1]))))
+        self.assertTrue(os.path.exists(self.cache.path(self.cache.key(sources[0]))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from plan import PageJob, plan_build, plan_pages, schedule, selected
+from site_index import SiteIndex
+from test_images import make_png
+import log
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/a/index.md", "# A\n\n" + "Long post. " * 100)
+        self.write("content/blog/b.md", "# B")
+        self.write("content/drafts/c.md", "# C")
+        self.write("content/notes.txt", "not a page")
+        self.write("static/index.css", "body {}")
+        self.write("static/images/logo.svg", "<svg/>")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def rel(self, jobs, root):
+        return [os.path.relpath(job.source, root) for job in jobs]
+
+    def test_plan(self):
+        plan = plan_build(self.paths)
+        self.assertEqual(self.rel(plan.pages, self.paths.content),
+                         ["blog/a/index.md", "blog/b.md", "drafts/c.md", "index.md"])
+        self.assertEqual(os.path.relpath(plan.pages[1].dest, self.paths.output), "blog/b.html")
+        self.assertEqual(plan.pages[3].size, len("# Home"))
+        self.assertEqual([job.rel for job in plan.assets], ["images/logo.svg", "index.css"])
+        self.assertEqual(plan.assets[1].stat.st_size, len("body {}"))
+
+    def test_globs(self):
+        self.assertTrue(selected("blog/a/index.md", ["blog/*"]))
+        self.assertFalse(selected("index.md", ["blog/*"]))
+        self.assertFalse(selected("blog/a/index.md", [], ["*/a/*"]))
+        pages = plan_pages(self.paths.content, self.paths.output, exclude=["drafts"])
+        self.assertEqual(self.rel(pages, self.paths.content), ["blog/a/index.md", "blog/b.md", "index.md"])
+        pages = plan_pages(self.paths.content, self.paths.output, include=["blog/*"], exclude=["*/b.md"])
+        self.assertEqual(self.rel(pages, self.paths.content), ["blog/a/index.md"])
+
+    def test_schedule_largest_first(self):
+        pages = [("a", "a.html"), ("b", "b.html"), ("c", "c.html")]
+        self.assertEqual(schedule(pages, {"a": 1, "b": 30, "c": 1}), [("b", "b.html"), ("a", "a.html"), ("c", "c.html")])
+        self.assertEqual(schedule(pages), pages)
+        plan = plan_build(self.paths)
+        self.assertEqual(schedule(plan.page_paths(), plan.page_sizes())[0], (plan.pages[0].source, plan.pages[0].dest))
+        self.assertIsInstance(plan.pages[0], PageJob)
+
+    def test_excluded_files_are_not_built(self):
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        args = parse_args(["/", "--no-optimize-images", "--exclude", "drafts", "--exclude", "images"])
+        self.assertEqual(build_site(args, self.paths, manifest), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.paths.output, "blog", "b.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.paths.output, "index.css")))
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "drafts")))
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "images")))
+
+    def test_filtered_build_leaves_the_rest_alone(self):
+        with open(os.path.join(self.paths.static, "images", "logo.png"), "wb") as f:
+            f.write(make_png(4, 3))
+        self.write("content/blog/b.md", "# B\n\n![logo](/images/logo.png)")
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        build_site(parse_args(["/", "--no-optimize-images"]), self.paths, manifest)
+        self.write("content/blog/b.md", "# B\n\nChanged ![logo](/images/logo.png)")
+
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        build_site(parse_args(["/", "--no-optimize-images", "--include", "blog/**"]), self.paths, manifest)
+        for output in ("index.html", "drafts/c.html", "index.css", "images/logo.png", "images/logo.svg"):
+            self.assertTrue(os.path.exists(os.path.join(self.paths.output, output)), output)
+        self.assertEqual(sorted(manifest.assets), ["images/logo.png", "images/logo.svg", "index.css"])
+        self.assertEqual(len(manifest.pages), 4)
+        with open(os.path.join(self.paths.output, "blog", "b.html")) as f:
+            self.assertIn('width="4" height="3"', f.read())
+        index = SiteIndex(self.paths.index, self.paths.content, self.paths.output)
+        self.assertEqual(len(index.pages()), 4)
+        index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
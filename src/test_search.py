@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import unittest
+
+from inline_markdown import markdown_to_html_node
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from search import decode_postings, encode_postings, query_shards
+from site_index import page_terms
+import log
+
+
+class TestPostings(unittest.TestCase):
+    def test_delta_encoding_round_trip(self):
+        rows = [("ring", 2, 1), ("ring", 5, 3), ("ring", 9, 1), ("rivendell", 5, 2)]
+        shard = encode_postings(rows)
+        self.assertEqual(shard, {"ring": [2, 1, 3, 3, 4, 1], "rivendell": [5, 2]})
+        self.assertEqual(decode_postings(shard["ring"]), [(2, 1), (5, 3), (9, 1)])
+
+    def test_page_terms(self):
+        node = markdown_to_html_node("# The Ring\n\nThe **ring** of [power](/p) ![alt text](/a.png)")
+        self.assertEqual(page_terms(node), {"the": 2, "ring": 2, "of": 1, "power": 1})
+
+    def test_query_shards(self):
+        self.assertEqual(query_shards("Ring of Rivendell"), ["of", "ri"])
+
+
+class TestSearchBuild(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        self.write("template.html", "{{ Content }}")
+        self.write("content/index.md", "# Home\n\nElves and dwarves")
+        self.write("content/blog/ring/index.md", "# Ring\n\nElves forged rings")
+        self.write("static/index.css", "body {}")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.paths.output, "search", name)) as f:
+            return json.load(f)
+
+    def build(self, *argv):
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        build_site(parse_args(["-q", *(argv or ["--search"])]), self.paths, manifest)
+
+    def lookup(self, term):
+        index = self.read("index.json")
+        prefix = term[:index["prefix"]]
+        if prefix not in index["shards"]:
+            return []
+        shard = self.read(prefix + ".json")
+        return sorted(index["docs"][str(doc_id)][0] for doc_id, _ in decode_postings(shard.get(term, [])))
+
+    def test_lookup(self):
+        self.build()
+        self.assertEqual(self.lookup("elves"), ["/", "/blog/ring/"])
+        self.assertEqual(self.lookup("rings"), ["/blog/ring/"])
+
+    def test_incremental(self):
+        self.build()
+        shard = os.path.join(self.paths.output, "search", "dw.json")
+        os.utime(shard, ns=(0, 0))
+        self.write("content/blog/ring/index.md", "# Ring\n\nMen forged rings")
+        self.build()
+        self.assertEqual(os.stat(shard).st_mtime_ns, 0)  # no changed page has "dw..." terms
+        self.assertEqual(self.lookup("elves"), ["/"])
+        self.assertEqual(self.lookup("men"), ["/blog/ring/"])
+
+        os.unlink(os.path.join(self.paths.content, "index.md"))
+        self.build()
+        self.assertFalse(os.path.exists(shard))
+        self.assertEqual(self.lookup("elves"), [])
+
+    def test_removed_without_search(self):
+        self.build("--search", "--precompress", "--precompress-min-size", "1")
+        report = os.path.join(self.tmp.name, "changes.json")
+        self.build("--report-changes", report)
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "search")))
+        with open(report) as f:
+            self.assertIn("search/index.json", json.load(f)["removed"])
+        self.build()
+        self.assertEqual(self.lookup("elves"), ["/", "/blog/ring/"])
+
+
+if __name__ == "__main__":
+    unittest.main()
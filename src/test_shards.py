@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from shards import SHARD_MANIFEST, ShardMergeError, find_conflicts, parse_shard, select_shard, shard_of
+import log
+
+SITE = {
+    "template.html": "<title>{{ Title }}</title>{{ Content }}",
+    "static/index.css": "body {}",
+    "content/index.md": "# Home\n\nSee [the blog](/blog/).",
+    "content/contact/index.md": "# Contact\n\nWrite.",
+    "content/blog/a/index.md": "---\ndate: 2024-01-01\n---\n# A\n\nFirst post.",
+    "content/blog/b/index.md": "---\ndate: 2024-02-01\n---\n# B\n\nSecond [post](/blog/a/).",
+    "content/blog/c/index.md": "---\ndate: 2024-03-01\n---\n# C\n\nThird post.",
+}
+
+
+def shard_data(index, count, pages=(), files=None):
+    return {"shard": [index, count], "basepath": "/", "inputs_hash": "h", "assets": {},
+            "pages": {page: {} for page in pages}, "files": files or {}}
+
+
+class TestSharding(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "1", "a/b", "1/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+    def test_every_page_in_exactly_one_shard(self):
+        keys = [f"blog/{i}/index.md" for i in range(50)]
+        counts = [0] * 4
+        for key in keys:
+            shard = shard_of(key, 4)
+            self.assertEqual(shard, shard_of(key, 4))
+            counts[shard - 1] += 1
+        self.assertEqual(sum(counts), 50)
+        self.assertTrue(all(counts))
+
+    def test_select_shard(self):
+        pages = [(os.path.join("content", f"{i}.md"), f"{i}.html") for i in range(10)]
+        selected = [select_shard(pages, "content", (i, 3)) for i in (1, 2, 3)]
+        self.assertEqual(sorted(page for shard in selected for page in shard), sorted(pages))
+        self.assertEqual(select_shard(pages, "content", None), pages)
+
+    def test_conflicts(self):
+        self.assertEqual(find_conflicts([("a", shard_data(1, 2, ["x.md"])), ("b", shard_data(2, 2, ["y.md"]))],
+                                        ["x.md", "y.md"], "/", "h"), [])
+        self.assertEqual(find_conflicts([("a", shard_data(1, 2))]), ["missing shard(s) 2/2"])
+        self.assertEqual(find_conflicts([("a", shard_data(1, 2, ["x.md"])), ("b", shard_data(2, 2, ["x.md"]))]),
+                         ["x.md was built by both a and b"])
+        self.assertEqual(find_conflicts([("a", shard_data(1, 2, files={"i.css": "1"})),
+                                         ("b", shard_data(2, 2, files={"i.css": "2"}))]),
+                         ["i.css differs between a and b"])
+        self.assertEqual(find_conflicts([("a", shard_data(1, 1, ["x.md"]))], ["x.md", "y.md"], "/", "other"),
+                         ["a was built with other templates, static files or options", "y.md is in no shard"])
+
+
+class TestShardedBuild(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def checkout(self, name):
+        # one CI runner's copy of the repository
+        root = os.path.join(self.tmp.name, name)
+        for rel, text in SITE.items():
+            path = os.path.join(root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        return site_paths(root)
+
+    def build(self, paths, *argv):
+        manifest = BuildManifest.load(str(paths.manifest), str(paths.root))
+        return build_site(parse_args(["/", "--no-optimize-images", "--search", "--listings", *argv]), paths, manifest)
+
+    def outputs(self, paths):
+        files = {}
+        for dirpath, _, filenames in os.walk(paths.output):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, paths.output)] = f.read()
+        return files
+
+    def test_merge_matches_full_build(self):
+        full = self.checkout("full")
+        self.assertEqual(self.build(full, "--check-links"), 0)
+        shards = [self.checkout(f"shard{i}") for i in (1, 2)]
+        for i, paths in enumerate(shards, 1):
+            self.assertEqual(self.build(paths, "--shard", f"{i}/2"), 0)
+            self.assertTrue(os.path.exists(os.path.join(paths.output, SHARD_MANIFEST)))
+        self.assertFalse(os.path.exists(os.path.join(shards[0].output, "blog", "index.html")))
+
+        merged = self.checkout("merged")
+        self.assertEqual(self.build(merged, "--check-links", "--merge", *(str(p.output) for p in shards)), 0)
+        self.assertEqual(self.outputs(merged), self.outputs(full))
+
+    def test_conflicting_shards_are_not_merged(self):
+        shards = [self.checkout(f"shard{i}") for i in (1, 2)]
+        for i, paths in enumerate(shards, 1):
+            self.build(paths, "--shard", f"{i}/2")
+        manifest_path = os.path.join(shards[1].output, SHARD_MANIFEST)
+        with open(manifest_path) as f:
+            data = json.load(f)
+        data["files"]["index.css"] = "0" * 64
+        with open(manifest_path, "w") as f:
+            json.dump(data, f)
+
+        merged = self.checkout("merged")
+        manifest = BuildManifest.load(str(merged.manifest), str(merged.root))
+        args = parse_args(["/", "--no-optimize-images", "--search", "--listings", "--merge", *(str(p.output) for p in shards)])
+        with self.assertLogs("site", "ERROR") as logs:
+            self.assertEqual(build_site(args, merged, manifest), 1)
+        self.assertIn("index.css differs between", "\n".join(logs.output))
+        self.assertFalse(os.path.exists(merged.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from inline_markdown import markdown_to_html_node
+from listings import publish_listings
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from site_index import SiteIndex, page_metadata, section_of, url_of
+import log
+
+
+class TestPageMetadata(unittest.TestCase):
+    def test_metadata(self):
+        node = markdown_to_html_node("# Post\n\n[< Back](/)\n\nSee [the ring](/blog/ring) **now**.")
+        metadata = page_metadata({"date": "2024-01-02", "tags": "elves"}, "Post", node, [("link", "/", 3)])
+        self.assertEqual(metadata, {
+            "title": "Post",
+            "date": "2024-01-02",
+            "tags": ["elves"],
+            "summary": "See the ring now.",
+            "refs": [("link", "/", 3)],
+            "terms": {},
+        })
+
+    def test_paths(self):
+        self.assertEqual(section_of("blog/tom/index.md"), "blog")
+        self.assertEqual(section_of("blog/tom.md"), "blog")
+        self.assertEqual(section_of("blog/index.md"), "")
+        self.assertEqual(section_of("index.md"), "")
+        self.assertEqual(url_of("index.html"), "/")
+        self.assertEqual(url_of("blog/tom/index.html"), "/blog/tom/")
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/old/index.md", "---\ndate: 2023-05-01\n---\n# Old\n\nOld news.")
+        self.write("content/blog/new/index.md", "---\ndate: 2024-05-01\n---\n# New\n\nNews.")
+        self.write("static/index.css", "body {}")
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.paths.output, name)) as f:
+            return f.read()
+
+    def build(self, *argv):
+        manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        self.assertEqual(build_site(parse_args(["-q", *argv]), self.paths, manifest), 0)
+
+    def index(self):
+        return SiteIndex(self.paths.index, self.paths.content, self.paths.output)
+
+    def test_listing_sitemap_and_feed(self):
+        self.build("--listings", "--site-url", "https://example.com")
+        self.assertEqual(
+            self.read("blog/index.html"),
+            '<title>Blog</title><div><h1>Blog</h1><ul><li><a href="/blog/new/">New</a> (2024-05-01)</li>'
+            '<li><a href="/blog/old/">Old</a> (2023-05-01)</li></ul></div>',
+        )
+        self.assertIn("<loc>https://example.com/blog/new/</loc><lastmod>2024-05-01</lastmod>", self.read("sitemap.xml"))
+        feed = self.read("blog/feed.xml")
+        self.assertIn("<updated>2024-05-01T00:00:00Z</updated>", feed)
+        self.assertIn("<summary>News.</summary>", feed)
+
+    def test_incremental(self):
+        self.build("--listings")
+        listing = os.path.join(self.paths.output, "blog", "index.html")
+        os.utime(listing, ns=(0, 0))
+        self.build("--listings")
+        self.assertEqual(os.stat(listing).st_mtime_ns, 0)  # nothing in the section changed
+
+        os.unlink(os.path.join(self.paths.content, "blog", "old", "index.md"))
+        self.build("--listings")
+        index = self.index()
+        self.assertEqual([page.title for page in index.pages("blog")], ["New"])
+        index.close()
+        self.assertNotIn("Old", self.read("blog/index.html"))
+
+    def test_missing_index_is_rebuilt(self):
+        self.build()
+        os.unlink(self.paths.index)
+        self.build()
+        index = self.index()
+        self.assertEqual(sorted(index.hashes()), ["blog/new/index.md", "blog/old/index.md", "index.md"])
+        self.assertEqual(index.refs("index.md"), [])
+        index.close()
+
+    def test_section_with_own_index_is_not_listed(self):
+        self.write("content/blog/index.md", "# My blog")
+        self.build("--listings")
+        self.assertEqual(self.read("blog/index.html"), "<title>My blog</title><div><h1>My blog</h1></div>")
+
+    def test_listings_are_opt_in(self):
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "blog", "index.html")))
+        self.build("--listings")
+        self.assertIn("New", self.read("blog/index.html"))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "blog", "index.html")))
+
+    def test_static_file_is_not_listed_over(self):
+        self.write("static/blog/index.html", "static page")
+        with self.assertLogs("site", "WARNING") as logs:
+            self.build("--listings")
+        self.assertIn("Not listing blog", logs.output[0])
+        self.assertEqual(self.read("blog/index.html"), "static page")
+
+
+if __name__ == "__main__":
+    unittest.main()
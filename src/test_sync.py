@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from manifest import hash_file
+from minify import CssMinifier
+from sync import asset_urls, fingerprint_name, sync_tree
+
+
+class TestSyncTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "static")
+        self.target = os.path.join(self.tmp.name, "docs")
+        self.write(self.source, "index.css", "body {}")
+        self.write(self.source, "images/tom.png", "png bytes")
+        self.write(self.target, "index.html", "<p>page</p>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, root, name, text):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.target, name)) as f:
+            return f.read()
+
+    def test_copies_only_changed_files(self):
+        for compare in ("mtime", "size", "hash"):
+            with self.subTest(compare=compare):
+                first = sync_tree(self.source, self.target, {}, compare)
+                self.assertEqual(sorted(first.assets), ["images/tom.png", "index.css"])
+                second = sync_tree(self.source, self.target, first.assets, compare)
+                self.assertEqual(second.copied, [])
+
+    def test_changed_file_is_copied(self):
+        first = sync_tree(self.source, self.target, {}, "hash")
+        self.write(self.source, "index.css", "body {!}")
+        second = sync_tree(self.source, self.target, first.assets, "hash")
+        self.assertEqual(second.copied, ["index.css"])
+        self.assertEqual(self.read("index.css"), "body {!}")
+
+    def test_removes_only_own_outputs(self):
+        first = sync_tree(self.source, self.target, {})
+        os.unlink(os.path.join(self.source, "images", "tom.png"))
+        second = sync_tree(self.source, self.target, first.assets)
+        self.assertEqual(second.removed, ["images/tom.png"])
+        self.assertFalse(os.path.exists(os.path.join(self.target, "images")))
+        self.assertEqual(self.read("index.html"), "<p>page</p>")
+
+    def test_copy_methods(self):
+        for method in ("copy", "hardlink", "reflink", "range"):
+            with self.subTest(method=method):
+                target = os.path.join(self.tmp.name, method)
+                sync_tree(self.source, target, {}, "mtime", method)
+                with open(os.path.join(target, "images", "tom.png")) as f:
+                    self.assertEqual(f.read(), "png bytes")
+                self.assertEqual(sync_tree(self.source, target, {}, "mtime", method).copied, [])
+
+    def test_hardlinked_output_is_replaced_not_overwritten(self):
+        sync_tree(self.source, self.target, {}, "mtime", "hardlink")
+        self.write(self.source, "index.css", "body { color: red }")
+        sync_tree(self.source, self.target, {}, "size", "copy")
+        self.assertEqual(self.read("index.css"), "body { color: red }")
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "static")
+        self.target = os.path.join(self.tmp.name, "docs")
+        os.makedirs(self.source)
+        self.write("body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        with open(os.path.join(self.source, "index.css"), "w") as f:
+            f.write(text)
+
+    def read_target(self, rel):
+        with open(os.path.join(self.target, rel)) as f:
+            return f.read()
+
+    def test_name_is_stable(self):
+        first = sync_tree(self.source, self.target, {}, fingerprint=True)
+        output = first.assets["index.css"]["output"]
+        self.assertRegex(output, r"^index\.[0-9a-f]{10}\.css$")
+        self.assertTrue(os.path.exists(os.path.join(self.target, output)))
+        second = sync_tree(self.source, self.target, first.assets, fingerprint=True)
+        self.assertEqual(second.assets["index.css"]["output"], output)
+        self.assertEqual(second.copied, [])
+
+    def test_changed_content_gets_new_name(self):
+        first = sync_tree(self.source, self.target, {}, fingerprint=True)
+        old = first.assets["index.css"]["output"]
+        self.write("body { color: red }")
+        second = sync_tree(self.source, self.target, first.assets, fingerprint=True)
+        new = second.assets["index.css"]["output"]
+        self.assertNotEqual(old, new)
+        self.assertEqual(second.removed, [old])
+        self.assertFalse(os.path.exists(os.path.join(self.target, old)))
+        self.assertEqual(asset_urls(second.assets), {"/index.css": "/" + new})
+
+    def test_name_follows_the_published_bytes(self):
+        minifier = CssMinifier(os.path.join(self.tmp.name, "cache"))
+        first = sync_tree(self.source, self.target, {}, fingerprint=True, optimizers=[minifier])
+        old = first.assets["index.css"]["output"]
+        self.assertEqual(old, fingerprint_name("index.css", hash_file(os.path.join(self.target, old))))
+        # a new minifier publishes other bytes for the same source
+        with patch("minify.MINIFY_VERSION", 2), patch("minify.minify_css", lambda text: "body{}/*v2*/"):
+            second = sync_tree(self.source, self.target, first.assets, fingerprint=True, optimizers=[minifier])
+        new = second.assets["index.css"]["output"]
+        self.assertNotEqual(old, new)
+        self.assertEqual(self.read_target(new), "body{}/*v2*/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import TemplateLoader
+from urls import UrlRewriter
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template_path = os.path.join(self.root, "template.html")
+        self.write("template.html", '<link href="/index.css"><title>{{ Title }}</title>{{> nav }}<main>{{ Content }}</main>')
+        self.write("partials/nav.html", '<a href="/">Home</a><img src="https://example.com/x.png">')
+        self.write("layouts/post.html", "<article>{{ Title }} on {{ date }}{{ Content }}</article>")
+        self.loader = TemplateLoader(self.template_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_render_with_partial_and_basepath(self):
+        content = ParentNode("p", [
+            LeafNode("a", "post", {"href": "/blog/tom"}),
+            LeafNode(None, ' text mentioning href="/ stays put'),
+        ])
+        html = self.loader.layout().render_to_string(
+            {"Title": "Home", "Content": content}, UrlRewriter("/static-site/")
+        )
+        self.assertEqual(
+            html,
+            '<link href="/static-site/index.css"><title>Home</title>'
+            '<a href="/static-site/">Home</a><img src="https://example.com/x.png">'
+            '<main><p><a href="/static-site/blog/tom">post</a> text mentioning href="/ stays put</p></main>',
+        )
+
+    def test_layout_selection(self):
+        html = self.loader.layout("post").render_to_string(
+            {"Title": "Tom", "date": "2024-01-01", "Content": LeafNode("p", "body")}
+        )
+        self.assertEqual(html, "<article>Tom on 2024-01-01<p>body</p></article>")
+
+    def test_layout_outside_layouts_dir(self):
+        self.write("secret.html", "{{ Content }}")
+        for name in ("../secret", "../../etc/x", "a/../../secret", "..\\secret"):
+            with self.assertRaises(Exception):
+                self.loader.layout(name)
+
+    def test_compiled_once(self):
+        self.assertIs(self.loader.layout(), self.loader.layout())
+
+    def test_missing_variable(self):
+        with self.assertRaises(Exception):
+            self.loader.layout().render_to_string({"Title": "Home"})
+
+    def test_recursive_partial(self):
+        self.write("partials/nav.html", "{{> nav }}")
+        with self.assertRaises(Exception):
+            TemplateLoader(self.template_path).layout()
+
+    def test_inputs_hash_covers_partials(self):
+        before = self.loader.inputs_hash()
+        self.write("partials/nav.html", "<nav></nav>")
+        self.assertNotEqual(before, self.loader.inputs_hash())
+
+
+class TestUrlRewriter(unittest.TestCase):
+    def test_url(self):
+        rewriter = UrlRewriter("/static-site")
+        self.assertEqual(rewriter.url("/images/tom.png"), "/static-site/images/tom.png")
+        self.assertEqual(rewriter.url("https://www.boot.dev"), "https://www.boot.dev")
+        self.assertEqual(rewriter.url("//cdn.example.com/a.js"), "//cdn.example.com/a.js")
+        self.assertEqual(rewriter.url("relative/page"), "relative/page")
+
+    def test_props_are_not_mutated(self):
+        props = {"src": "/a.png", "alt": "a"}
+        self.assertEqual(UrlRewriter("/x/").props("img", props), {"src": "/x/a.png", "alt": "a"})
+        self.assertEqual(props, {"src": "/a.png", "alt": "a"})
+
+    def test_asset_map(self):
+        rewriter = UrlRewriter("/x/", {"/index.css": "/index.0123456789.css"})
+        self.assertEqual(rewriter.url("/index.css"), "/x/index.0123456789.css")
+        self.assertEqual(rewriter.url("/index.css?v=2#top"), "/x/index.0123456789.css?v=2#top")
+        self.assertEqual(rewriter.url("/other.css"), "/x/other.css")
+
+
+if __name__ == "__main__":
+    unittest.main()
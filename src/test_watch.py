@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+
+from main import build_site, parse_args, site_paths
+from manifest import BuildManifest
+from watch import SiteWatcher, diff_snapshots, inject_reload_script
+import log
+
+
+class TestSiteWatcher(unittest.TestCase):
+    def setUp(self):
+        log.configure_logging("quiet")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = site_paths(self.tmp.name)
+        self.write("template.html", "<body>{{ Content }}</body>")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post/index.md", "# Post")
+        self.write("static/index.css", "body {}")
+        self.args = parse_args(["-q"])
+        self.manifest = BuildManifest.load(str(self.paths.manifest), str(self.paths.root))
+        build_site(self.args, self.paths, self.manifest)
+        self.watcher = SiteWatcher(self.args, self.paths, self.manifest)
+
+    def tearDown(self):
+        log.configure_logging("normal")
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        # make sure the watcher sees a new stamp even on coarse clocks
+        stamp = time.time_ns() + 10 ** 9
+        os.utime(path, ns=(stamp, stamp))
+
+    def output(self, name):
+        path = os.path.join(self.paths.output, name)
+        with open(path) as f:
+            return f.read()
+
+    def test_no_change(self):
+        self.assertFalse(self.watcher.poll())
+
+    def test_markdown_change_rebuilds_only_that_page(self):
+        before = os.stat(os.path.join(self.paths.output, "blog/post/index.html")).st_mtime_ns
+        self.write("content/index.md", "# Home again")
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.output("index.html"), "<body><div><h1>Home again</h1></div></body>")
+        after = os.stat(os.path.join(self.paths.output, "blog/post/index.html")).st_mtime_ns
+        self.assertEqual(before, after)
+
+    def test_static_change_and_removal(self):
+        self.write("static/index.css", "body { color: red }")
+        self.watcher.poll()
+        self.assertEqual(self.output("index.css"), "body { color: red }")
+        os.unlink(os.path.join(self.tmp.name, "static/index.css"))
+        self.watcher.poll()
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "index.css")))
+        self.assertNotIn("index.css", self.manifest.assets)
+
+    def test_template_change_rebuilds_everything(self):
+        self.write("template.html", "<main>{{ Content }}</main>")
+        self.watcher.poll()
+        self.assertEqual(self.output("blog/post/index.html"), "<main><div><h1>Post</h1></div></main>")
+
+    def test_removed_page(self):
+        os.unlink(os.path.join(self.tmp.name, "content/blog/post/index.md"))
+        self.watcher.poll()
+        self.assertFalse(os.path.exists(os.path.join(self.paths.output, "blog/post/index.html")))
+
+
+class TestHelpers(unittest.TestCase):
+    def test_diff_snapshots(self):
+        old = {"a": (1, 1), "b": (1, 1)}
+        new = {"a": (2, 1), "c": (1, 1)}
+        self.assertEqual(diff_snapshots(old, new), (["a", "c"], ["b"]))
+
+    def test_inject_reload_script(self):
+        html = inject_reload_script(b"<html><body><p>x</p></body></html>")
+        self.assertTrue(html.startswith(b"<html><body><p>x</p><script>"))
+        self.assertTrue(html.endswith(b"</script></body></html>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+URL_PROPS = ("href", "src")
+# added to images whose intrinsic size is known, so the browser can reserve
+# their space before they load
+IMAGE_PROPS = {"loading": "lazy", "decoding": "async"}
+
+
+def split_path(url):
+    # "/a/b.css?v=1#top" -> ("/a/b.css", "?v=1#top")
+    end = len(url)
+    for marker in "?#":
+        index = url.find(marker)
+        if index != -1 and index < end:
+            end = index
+    return url[:end], url[end:]
+
+
+class UrlRewriter():
+    def __init__(self, basepath="/", assets=None, images=None):
+        if not basepath.endswith("/"):
+            basepath += "/"
+        self.basepath = basepath
+        self.assets = assets or {}
+        self.images = images or {}
+
+    def url(self, url):
+        # only site-absolute paths move with the basepath; external and
+        # protocol-relative ("//host/...") URLs are left alone
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        if self.assets:
+            path, suffix = split_path(url)
+            url = self.assets.get(path, path) + suffix
+        return self.basepath + url[1:]
+
+    def props(self, tag, props):
+        if not props:
+            return props
+        rewritten = props
+        if tag == "img" and self.images and "width" not in props:
+            size = self.images.get(split_path(props.get("src", ""))[0])
+            if size is not None:
+                rewritten = dict(props, width=str(size[0]), height=str(size[1]))
+                for name, value in IMAGE_PROPS.items():
+                    rewritten.setdefault(name, value)
+        for name in URL_PROPS:
+            value = props.get(name)
+            if value is None:
+                continue
+            new_value = self.url(value)
+            if new_value != value:
+                if rewritten is props:
+                    rewritten = dict(props)
+                rewritten[name] = new_value
+        return rewritten
@@ -0,0 +1,238 @@
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from build import (PageBuildError, asset_optimizers, build_pages, check_site_links, collect_pages,
+                   precompress_site, publish_site_listings, render_inputs_hash, render_options,
+                   report_failures, write_asset_manifest)
+from plan import selected
+from site_index import SiteIndex
+from sync import remove_output, sync_file
+from template import get_loader
+import logging, os, threading, time
+
+logger = logging.getLogger("site")
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    b'<script>new EventSource("' + RELOAD_PATH.encode()
+    + b'").onmessage = function () { location.reload(); };</script>'
+)
+
+
+def snapshot(roots):
+    files = {}
+    for root in roots:
+        root = str(root)
+        if os.path.isfile(root):
+            stat = os.stat(root)
+            files[root] = (stat.st_mtime_ns, stat.st_size)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # deleted while we were walking
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def diff_snapshots(old, new):
+    changed = sorted(path for path, stamp in new.items() if old.get(path) != stamp)
+    removed = sorted(path for path in old if path not in new)
+    return changed, removed
+
+def is_under(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+def inject_reload_script(body):
+    index = body.rfind(b"</body>")
+    if index == -1:
+        return body + RELOAD_SCRIPT
+    return body[:index] + RELOAD_SCRIPT + body[index:]
+
+
+class SiteWatcher():
+    def __init__(self, args, paths, manifest):
+        self.args = args
+        self.paths = paths
+        self.manifest = manifest
+        self.options = render_options(args, paths, manifest)
+        self.index = SiteIndex(paths.index, paths.content, paths.output)
+        loader = get_loader(paths.template)
+        self.template_inputs = [str(paths.template), loader.layouts_dir, loader.partials_dir]
+        self.roots = [str(paths.content), str(paths.static)] + self.template_inputs
+        self.snapshot = snapshot(self.roots)
+
+    def poll(self):
+        current = snapshot(self.roots)
+        changed, removed = diff_snapshots(self.snapshot, current)
+        if not changed and not removed:
+            return False
+        self.snapshot = current
+        started = time.perf_counter()
+        self.rebuild(changed, removed)
+        self.manifest.save()
+        self.index.commit()
+        logger.info("Rebuilt %d changed file(s) in %.0f ms", len(changed) + len(removed),
+                    (time.perf_counter() - started) * 1000)
+        return True
+
+    def is_template_input(self, path):
+        return path == self.template_inputs[0] or any(is_under(path, d) for d in self.template_inputs[1:])
+
+    def is_selected(self, path, root):
+        # the same --include/--exclude globs the initial build went by
+        if not is_under(path, root):
+            return False
+        rel = os.path.relpath(path, root).replace(os.sep, "/")
+        return selected(rel, self.args.include, self.args.exclude)
+
+    def page_dest(self, source):
+        rel = os.path.relpath(source, self.paths.content)
+        return os.path.join(self.paths.output, os.path.splitext(rel)[0] + ".html")
+
+    def rebuild(self, changed, removed):
+        # static files first: with fingerprinting they decide the asset URLs
+        # every page is rendered with
+        self.sync_static(changed, removed)
+        options = render_options(self.args, self.paths, self.manifest)
+        assets_changed = (options.asset_urls != self.options.asset_urls
+                          or options.image_sizes != self.options.image_sizes)
+        self.options = options
+
+        if assets_changed or any(self.is_template_input(path) for path in changed + removed):
+            # every page depends on these, so this is a full page build
+            self.manifest.use_inputs(render_inputs_hash(self.paths, options), self.args.basepath)
+            pages = collect_pages(self.paths.content, self.paths.output, self.args.include, self.args.exclude)
+        else:
+            pages = [(path, self.page_dest(path)) for path in changed
+                     if path.endswith(".md") and self.is_selected(path, self.paths.content)]
+        try:
+            build_pages(pages, self.paths.template, self.args.basepath, self.manifest, self.args.jobs,
+                        self.options, self.index)
+        except PageBuildError as e:
+            report_failures(e)
+
+        for path in removed:
+            if path.endswith(".md") and is_under(path, self.paths.content):
+                self.index.remove_page(path)
+                output = self.manifest.forget_page(path)
+                if output and os.path.exists(output):
+                    os.unlink(output)
+                    logger.info("Removed %s, its source no longer exists.", output)
+        publish_site_listings(self.args, self.paths, self.manifest, self.options, self.index)
+        if self.args.check_links:
+            check_site_links(self.args, self.paths, self.manifest, self.index)
+        precompress_site(self.args, self.paths, self.manifest)
+
+    def sync_static(self, changed, removed):
+        touched = False
+        optimizers = asset_optimizers(self.args, self.paths)
+        for path in changed:
+            if self.is_selected(path, self.paths.static):
+                rel = os.path.relpath(path, self.paths.static).replace(os.sep, "/")
+                previous = self.manifest.assets.get(rel)
+                entry, _ = sync_file(self.paths.static, self.paths.output, rel, previous,
+                                     self.args.sync_compare, self.args.copy_method, self.args.fingerprint,
+                                     optimizers)
+                if previous and previous["output"] != entry["output"]:
+                    remove_output(self.paths.output, previous["output"])
+                self.manifest.assets[rel] = entry
+                touched = True
+                logger.info("Copied %s", entry["output"])
+        for path in removed:
+            if is_under(path, self.paths.static):
+                rel = os.path.relpath(path, self.paths.static).replace(os.sep, "/")
+                previous = self.manifest.assets.pop(rel, None)
+                if previous:
+                    remove_output(self.paths.output, previous["output"])
+                touched = True
+                logger.info("Removed %s, its source no longer exists.", rel)
+        if touched:
+            write_asset_manifest(self.paths.output, self.manifest.assets, self.args.fingerprint)
+
+
+class LiveReloadServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory):
+        super().__init__(address, partial(LiveReloadHandler, directory=str(directory)))
+        self.generation = 0
+        self.changed = threading.Condition()
+
+    def notify_reload(self):
+        with self.changed:
+            self.generation += 1
+            self.changed.notify_all()
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            self.stream_reloads()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            self.send_page(path)
+            return
+        super().do_GET()
+
+    def send_page(self, path):
+        with open(path, "rb") as f:
+            body = inject_reload_script(f.read())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        server = self.server
+        seen = server.generation
+        try:
+            while True:
+                with server.changed:
+                    server.changed.wait_for(lambda: server.generation != seen, timeout=15)
+                    current = server.generation
+                if current != seen:
+                    seen = current
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def watch_site(args, paths, manifest):
+    server = LiveReloadServer(("", args.port), paths.output)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Serving %s at http://localhost:%d/, watching for changes", paths.output, args.port)
+
+    watcher = SiteWatcher(args, paths, manifest)
+    try:
+        while True:
+            time.sleep(args.poll_interval)
+            try:
+                if watcher.poll():
+                    server.notify_reload()
+            except Exception as e:
+                # a broken edit should not end the session, report and keep going
+                logger.error("error: rebuild failed: %s", e)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0